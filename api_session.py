@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from exceptions import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(
+    os.getenv('HTTP_POOL_SIZE', os.getenv('POLL_CONCURRENCY', 100))
+)
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', '').lower() in ('1', 'true', 'yes')
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 20))
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', 60))
+
+_session = None
+_recorder = None
+_request_exceptions = None
+_session_lock = threading.Lock()
+_deadlines = threading.local()
+_make_timeout = None
+_pool_size = HTTP_POOL_SIZE
+_http2 = HTTP2_ENABLED
+
+
+def configure(pool_size=None, http2=None):
+    """.
+    Задает размер пула соединений и использование HTTP/2. Уже созданная
+    сессия закрывается и будет пересоздана при следующем запросе.
+    """
+    global _pool_size, _http2
+    if pool_size is not None:
+        _pool_size = pool_size
+    if http2 is not None:
+        _http2 = http2
+    close()
+
+
+def request_exceptions():
+    """.
+    Классы исключений HTTP-клиента, которые означают сбой запроса.
+    `requests` импортируется при первом обращении, а не при запуске бота.
+    """
+    global _request_exceptions
+    if _request_exceptions is None:
+        import requests
+
+        _request_exceptions = (requests.exceptions.RequestException,)
+    return _request_exceptions
+
+
+def _create_session():
+    """.
+    Создает клиент: `httpx` с HTTP/2, если он включен и установлен,
+    иначе - `requests.Session` с пулом keep-alive соединений.
+    """
+    global _request_exceptions, _make_timeout
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    if _http2:
+        try:
+            import httpx
+        except ImportError:
+            logger.warning(
+                'HTTP/2 недоступен: не установлен пакет `httpx[http2]`.'
+            )
+        else:
+            _request_exceptions = (
+                requests.exceptions.RequestException, httpx.HTTPError
+            )
+            _make_timeout = (
+                lambda connect, read: httpx.Timeout(read, connect=connect)
+            )
+            limits = httpx.Limits(
+                max_connections=_pool_size,
+                max_keepalive_connections=_pool_size
+            )
+            return httpx.Client(
+                http2=True, limits=limits, timeout=httpx.Timeout(
+                    HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT
+                )
+            )
+    _make_timeout = None
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Возвращает общий клиент, создавая его при первом вызове."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+@contextmanager
+def deadline(seconds):
+    """.
+    Ограничивает `seconds` секундами все запросы и чтение ответов внутри
+    блока в текущем потоке. Таймауты запросов сокращаются до оставшегося
+    времени, а тело ответа читается под надзором `_Watchdog`, поэтому и
+    медленно передаваемый ответ прерывается `DeadlineExceededError` в срок.
+    """
+    previous = getattr(_deadlines, 'at', None)
+    _deadlines.at = time.monotonic() + seconds
+    if previous is not None:
+        _deadlines.at = min(_deadlines.at, previous)
+    try:
+        yield
+    finally:
+        _deadlines.at = previous
+
+
+def remaining():
+    """.
+    Сколько секунд осталось до срока текущего потока (`None` без срока).
+    Если срок истек, вызывает `DeadlineExceededError`.
+    """
+    deadline_at = getattr(_deadlines, 'at', None)
+    if deadline_at is None:
+        return None
+    left = deadline_at - time.monotonic()
+    if left <= 0:
+        raise _deadline_error()
+    return left
+
+
+def _deadline_error():
+    return DeadlineExceededError(
+        'Запрос к сервису Практикум.Домашка прерван: истекло время, '
+        'отведенное на опрос.'
+    )
+
+
+class _Watch:
+    """Надзор за чтением одного ответа до момента `at`."""
+
+    __slots__ = ('at', 'response', 'fired')
+
+    def __init__(self, at, response):
+        """Запоминает срок и ответ."""
+        self.at = at
+        self.response = response
+        self.fired = False
+
+
+class _Watchdog:
+    """.
+    Фоновый поток, обрывающий соединение, если чтение ответа не уложилось в
+    срок. Таймауты `requests` действуют на каждое чтение из сокета, а не на
+    ответ целиком: сервер, отдающий тело по байту, иначе задержал бы опрос
+    сколь угодно долго. Одновременно под надзором не больше одного чтения
+    на поток опроса, поэтому активные чтения просто перебираются.
+    """
+
+    def __init__(self):
+        """Создает надзор; поток запускается при первом чтении."""
+        self._condition = threading.Condition()
+        self._active = set()
+        self._thread = None
+
+    def watch(self, at, response):
+        """Ставит чтение `response` под надзор до момента `at`."""
+        watch = _Watch(at, response)
+        with self._condition:
+            self._active.add(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='http-watchdog', daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return watch
+
+    def cancel(self, watch):
+        """Снимает надзор. Возвращает `True`, если соединение оборвано."""
+        with self._condition:
+            self._active.discard(watch)
+            return watch.fired
+
+    def _run(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                for watch in [w for w in self._active if w.at <= now]:
+                    self._active.discard(watch)
+                    watch.fired = True
+                    _abort(watch.response)
+                timeout = None
+                if self._active:
+                    timeout = min(w.at for w in self._active) - now
+                self._condition.wait(timeout)
+
+
+_WATCHDOG = _Watchdog()
+
+
+def _abort(response):
+    """.
+    Обрывает соединение ответа `requests`, которое еще не возвращено в пул;
+    блокированное чтение из сокета при этом сразу завершается ошибкой.
+    """
+    connection = getattr(getattr(response, 'raw', None), 'connection', None)
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _watched(response):
+    """.
+    Выполняет блок чтения тела `response` под надзором `_Watchdog` до срока
+    текущего потока. Если соединение оборвано по сроку, вместо ошибки
+    чтения или неполного тела вызывает `DeadlineExceededError`.
+    """
+    deadline_at = getattr(_deadlines, 'at', None)
+    if deadline_at is None:
+        yield
+        return
+    remaining()
+    watch = _WATCHDOG.watch(deadline_at, response)
+    try:
+        yield
+    except Exception as error:
+        if _WATCHDOG.cancel(watch):
+            raise _deadline_error() from error
+        raise
+    if _WATCHDOG.cancel(watch):
+        raise _deadline_error()
+
+
+def read(response):
+    """.
+    Читает тело потокового ответа целиком с учетом срока текущего потока и
+    возвращает его. После чтения тело доступно через `text` и `json`.
+    """
+    with _watched(response):
+        return response.content
+
+
+def iter_content(response, chunk_size):
+    """.
+    Части тела потокового ответа по `chunk_size` байт. Каждая часть
+    читается с учетом срока текущего потока.
+    """
+    chunks = response.iter_content(chunk_size)
+    while True:
+        with _watched(response):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def timeout():
+    """Таймауты `(connect, read)` для очередного запроса с учетом срока."""
+    left = remaining()
+    if left is None:
+        return HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+    return min(HTTP_CONNECT_TIMEOUT, left), min(HTTP_READ_TIMEOUT, left)
+
+
+def set_session(session):
+    """.
+    Подменяет общий клиент, например клиентом воспроизведения записанных
+    ответов. Прежний клиент закрывается.
+    """
+    global _session
+    close()
+    with _session_lock:
+        _session = session
+
+
+def set_recorder(recorder):
+    """.
+    Подключает запись ответов `recorder` (см. `replay.Recorder`) или
+    отключает ее при `None`.
+    """
+    global _recorder
+    _recorder = recorder
+
+
+class StreamedResponse:
+    """.
+    Потоковый ответ `httpx` с интерфейсом потокового ответа `requests`:
+    `iter_content`, `content`, `text`, `json` и `close`. Тело читается
+    частями по мере получения из сети, и перед каждой частью проверяется
+    срок текущего потока.
+    """
+
+    def __init__(self, response):
+        """Оборачивает ответ `httpx`, тело которого еще не прочитано."""
+        self._response = response
+        self._content = None
+        self.status_code = response.status_code
+
+    def iter_content(self, chunk_size=None):
+        """.
+        Части тела ответа по мере получения из сети; `chunk_size` не
+        используется, чтобы не ждать накопления части. Прочитанное целиком
+        тело отдается из памяти.
+        """
+        if self._content is not None:
+            return iter((self._content,))
+        return self._response.iter_bytes()
+
+    @property
+    def content(self):
+        """Тело ответа целиком; после чтения оно хранится в памяти."""
+        if self._content is None:
+            chunks = []
+            for chunk in self._response.iter_bytes():
+                remaining()
+                chunks.append(chunk)
+            self._content = b''.join(chunks)
+        return self._content
+
+    @property
+    def text(self):
+        """Тело ответа целиком как строка."""
+        encoding = getattr(self._response, 'encoding', None) or 'utf-8'
+        return self.content.decode(encoding, errors='replace')
+
+    def json(self):
+        """Тело ответа, разобранное как JSON."""
+        return json.loads(self.content)
+
+    def close(self):
+        """Закрывает ответ и возвращает соединение в пул."""
+        self._response.close()
+
+
+def _fetch(session, url, stream=False, **kwargs):
+    """.
+    GET-запрос через клиент `session`. Если у потока есть срок, ответ
+    запрашивается потоково, а тело без `stream=True` дочитывается здесь же
+    функцией `read`: так срок ограничивает и передачу тела. Клиент `httpx`
+    не принимает `stream` в `get`, поэтому его потоковый запрос
+    отправляется через `send(..., stream=True)`.
+    """
+    if not stream and getattr(_deadlines, 'at', None) is None:
+        return session.get(url, **kwargs)
+    if hasattr(session, 'build_request'):
+        request = session.build_request('GET', url, **kwargs)
+        response = StreamedResponse(session.send(request, stream=True))
+    else:
+        response = session.get(url, stream=True, **kwargs)
+    if not stream:
+        read(response)
+    return response
+
+
+def get(url, **kwargs):
+    """.
+    GET-запрос через общий клиент с переиспользованием соединений. Если
+    таймаут не передан, используются таймауты подключения и чтения с учетом
+    срока текущего потока. Параметр `stream=True` поддерживается для обоих
+    клиентов: ответ `httpx` оборачивается в `StreamedResponse`; тело
+    потокового ответа читается функциями `read` и `iter_content`.
+    """
+    session = get_session()
+    if 'timeout' not in kwargs:
+        kwargs['timeout'] = timeout()
+        if _make_timeout is not None:
+            kwargs['timeout'] = _make_timeout(*kwargs['timeout'])
+    fetch = partial(_fetch, session)
+    if _recorder is not None:
+        return _recorder.call(fetch, url, **kwargs)
+    return fetch(url, **kwargs)
+
+
+def close():
+    """Закрывает общий клиент и все соединения пула."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
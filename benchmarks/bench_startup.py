@@ -0,0 +1,101 @@
+"""Бенчмарк запуска бота: время импорта и время до первого опроса.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_startup --runs 5
+
+Время импорта - накопленное время загрузки модуля `homework` по данным
+`python -X importtime`. Время до первого опроса - от запуска процесса
+`python homework.py` до первого запроса к локальной заглушке Практикума.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import stubs
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def import_time(module='homework'):
+    """Накопленное время импорта `module` в новом процессе, с."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1_000_000
+    raise RuntimeError(f'Модуль {module} не найден в выводе importtime.')
+
+
+def time_to_first_poll(endpoint, telegram_url, timeout=30):
+    """Время от запуска `python homework.py` до первого запроса к API, с."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            PRACTICUM_TOKEN='token-0',
+            TELEGRAM_TOKEN='123:bench',
+            TELEGRAM_CHAT_ID='0',
+            PRACTICUM_ENDPOINT=endpoint,
+            TELEGRAM_API_URL=f'{telegram_url}/bot',
+            STATE_DB=str(Path(workdir) / 'state.sqlite3'),
+        )
+        env.pop('SUBSCRIPTIONS_FILE', None)
+        before = stubs.fetch_stats(telegram_url)['requests']
+        started = time.time()
+        process = subprocess.Popen(
+            [sys.executable, 'homework.py'], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.time() - started < timeout:
+                stats = stubs.fetch_stats(telegram_url)
+                if stats['requests'] > before:
+                    return stats['last_request_at'] - started
+                time.sleep(0.005)
+            raise RuntimeError('Бот не выполнил ни одного запроса.')
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def run(runs):
+    """Выполняет замеры и возвращает отчет-словарь с медианами."""
+    imports = [import_time() for _ in range(runs)]
+    process, endpoint, telegram_url = stubs.start(stubs.Options())
+    try:
+        first_polls = [
+            time_to_first_poll(endpoint, telegram_url) for _ in range(runs)
+        ]
+    finally:
+        process.terminate()
+    return {
+        'import_homework_s': round(statistics.median(imports), 4),
+        'time_to_first_poll_s': round(statistics.median(first_polls), 4),
+    }
+
+
+def main(args=None):
+    """Точка входа бенчмарка."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(args)
+    report = run(args.runs)
+    if args.json:
+        print(json.dumps(report))
+        return
+    for key, value in report.items():
+        print(f'{key:24} {value}')
+
+
+if __name__ == '__main__':
+    main()
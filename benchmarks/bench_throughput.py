@@ -0,0 +1,147 @@
+"""Бенчмарк пропускной способности бота на локальных заглушках.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_throughput --subscriptions 1000 --duration 60
+
+Бот работает по настоящему пути ввода-вывода: общий HTTP-клиент,
+движок опроса, очередь отправки и `telegram.Bot`, направленный на
+заглушку Telegram. Отчет: опросов в секунду, p50/p99 задержки
+уведомлений и память на одну подписку.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks import stubs
+
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка `values`."""
+    if not values:
+        return None
+    index = min(int(len(values) * fraction), len(values) - 1)
+    return round(values[index], 3)
+
+
+def parse_args(args=None):
+    """Параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscriptions', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--poll-interval', type=float, default=5)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка ответа заглушки Практикума, с')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов 500 от заглушки Практикума')
+    parser.add_argument('--history-size', type=int, default=10)
+    parser.add_argument('--change-interval', type=float, default=20)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести отчет в формате JSON')
+    return parser.parse_args(args)
+
+
+async def drive(subscriptions, bot, options, duration, workdir):
+    """Запускает движок опроса на `duration` секунд."""
+    import engine
+    from circuit_breaker import CircuitBreaker
+    from outbox import Outbox
+    from scheduler import AdaptiveInterval
+    from storage import MessageJournal, StateStore
+
+    store = StateStore(Path(workdir) / 'state.sqlite3')
+    journal = MessageJournal(Path(workdir) / 'state.sqlite3')
+    outbox = Outbox(bot, journal=journal)
+    interval = AdaptiveInterval(
+        options['poll_interval'], options['poll_interval'], jitter=0
+    )
+    outbox.start()
+    try:
+        await asyncio.wait_for(
+            engine.run(
+                subscriptions, outbox, options['concurrency'], interval,
+                store, CircuitBreaker()
+            ),
+            timeout=duration
+        )
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        outbox.stop(timeout=10)
+        store.close()
+        journal.close()
+
+
+def run(args):
+    """Выполняет бенчмарк и возвращает отчет-словарь."""
+    import api_session
+    import engine
+    import homework
+    from telegram import Bot
+
+    stub_options = stubs.Options(
+        latency=args.latency, error_rate=args.error_rate,
+        history_size=args.history_size, change_interval=args.change_interval
+    )
+    process, endpoint, telegram_url = stubs.start(stub_options)
+    homework.ENDPOINT = endpoint
+    api_session.configure(pool_size=args.concurrency)
+    bot = Bot(token='123:bench', base_url=f'{telegram_url}/bot')
+    try:
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        subscriptions = [
+            engine.Subscription(f'token-{index}', index)
+            for index in range(args.subscriptions)
+        ]
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        with tempfile.TemporaryDirectory() as workdir:
+            asyncio.run(drive(
+                subscriptions, bot, vars(args), args.duration, workdir
+            ))
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = stubs.fetch_stats(telegram_url)
+    finally:
+        process.terminate()
+    memory = sum(
+        stat.size_diff for stat in snapshot.compare_to(baseline, 'filename')
+    )
+    latencies = stats['latencies']
+    return {
+        'subscriptions': args.subscriptions,
+        'duration_s': round(elapsed, 2),
+        'polls': stats['requests'],
+        'polls_per_s': round(stats['requests'] / elapsed, 1),
+        'api_errors': stats['errors'],
+        'notifications': stats['notifications'],
+        'latency_p50_s': percentile(latencies, 0.5),
+        'latency_p99_s': percentile(latencies, 0.99),
+        'cpu_s': round(cpu, 2),
+        'memory_per_subscription_bytes': round(memory / args.subscriptions),
+    }
+
+
+def main(args=None):
+    """Точка входа бенчмарка."""
+    args = parse_args(args)
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return
+    for key, value in report.items():
+        print(f'{key:32} {value}')
+
+
+if __name__ == '__main__':
+    main()
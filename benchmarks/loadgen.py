@@ -0,0 +1,380 @@
+"""Нагрузочный прогон бота на тысячах виртуальных студентов.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.loadgen --subscriptions 5000 --duration 7200
+
+Каждый виртуальный студент сдает работы одну за другой. Работа уходит на
+проверку (`reviewing`), с вероятностью `--rejection-rate` возвращается с
+замечаниями (`rejected`) и снова отправляется на проверку, пока не будет
+принята (`approved`). Паузы между событиями случайны со средним
+`--review-time` секунд и воспроизводимы при одном `--seed`. Заглушка
+Практикума отдает работы по этим расписаниям, а бот опрашивает ее по
+настоящему пути ввода-вывода (см. `bench_throughput`).
+
+Отчет: процессорное время бота на 1000 подписок, рост памяти процесса в
+час по замерам раз в `--sample-interval` секунд, а также пропущенные,
+повторные и лишние уведомления. Пропущенным считается статус, который
+продержался не меньше `--grace` секунд, но так и не был отправлен; более
+короткие промежуточные статусы бот при опросе может законно не увидеть.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import random
+import re
+import resource
+import tempfile
+import threading
+import time
+
+from benchmarks import stubs
+from benchmarks.bench_throughput import drive, percentile
+
+NOTIFICATION = re.compile(r'"st-(\d+)-hw-(\d+)"\. (.+?)(?=\n\n|$)')
+STATUSES = {verdict: status for status, verdict in stubs.VERDICTS.items()}
+
+
+class Timelines:
+    """.
+    Расписания смены статусов работ виртуальных студентов и учет
+    отправленных ботом уведомлений для студентов с номерами от 0 до
+    `students - 1`. Расписание студента строится по требованию из `seed` и
+    номера студента и заканчивается к `horizon`. Уведомление обязательно,
+    если статус продержался не меньше `grace` секунд (по умолчанию -
+    `review_time`).
+    """
+
+    def __init__(self, students, started_at, horizon, review_time=120.0,
+                 rejection_rate=0.4, warmup=0.0, grace=None, seed=0):
+        """Задает параметры расписаний; события начинаются после `warmup`."""
+        self.students = students
+        self.started_at = started_at
+        self.horizon = horizon
+        self.review_time = review_time
+        self.rejection_rate = rejection_rate
+        self.warmup = warmup
+        self.grace = grace if grace is not None else review_time
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._events = {}
+        self._notifications = []
+
+    def __getstate__(self):
+        """Для передачи в процесс заглушек: без блокировки и кэша."""
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_events'] = {}
+        return state
+
+    def __setstate__(self, state):
+        """Восстанавливает сценарий в процессе заглушек."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _generate(self, index):
+        rng = random.Random(f'{self.seed}:{index}')
+        moment = (
+            self.started_at + self.warmup + rng.expovariate(
+                1 / self.review_time
+            )
+        )
+        events = []
+        number = 0
+        while moment < self.horizon:
+            events.append((moment, number, 'reviewing'))
+            moment += rng.expovariate(1 / self.review_time)
+            if rng.random() < self.rejection_rate:
+                events.append((moment, number, 'rejected'))
+            else:
+                events.append((moment, number, 'approved'))
+                number += 1
+            moment += rng.expovariate(1 / self.review_time)
+        return events
+
+    def events(self, index):
+        """.
+        События студента `index` по времени: кортежи `(время, номер работы,
+        статус)`.
+        """
+        with self._lock:
+            events = self._events.get(index)
+            if events is None:
+                events = self._events[index] = self._generate(index)
+        return events
+
+    def homeworks(self, index, from_date, now):
+        """Работы студента, статус которых менялся не раньше `from_date`."""
+        events = self.events(index)
+        latest = {}
+        for moment, number, status in events[
+                :bisect.bisect_right(events, (now, float('inf'), ''))]:
+            latest[number] = (moment, status)
+        return [
+            {
+                'id': index * 100_000 + number,
+                'homework_name': f'st-{index}-hw-{number}',
+                'status': status,
+                'date_updated': stubs.format_date(moment),
+                'lesson_name': 'Нагрузочный прогон',
+                'reviewer_comment': '',
+            }
+            for number, (moment, status) in latest.items()
+            if int(moment) >= from_date
+        ]
+
+    def record(self, index, text, received):
+        """Учитывает уведомление, полученное заглушкой Telegram."""
+        with self._lock:
+            for student, number, verdict in NOTIFICATION.findall(text):
+                self._notifications.append((
+                    int(student), int(number), STATUSES.get(verdict),
+                    received
+                ))
+
+    def _expected(self, now):
+        """.
+        События, уведомления о которых обязательны: статус продержался не
+        меньше `grace` секунд и отличается от предыдущего такого статуса
+        работы. Если работа ненадолго ушла в `rejected` и вернулась в
+        `reviewing`, бот, сравнивающий статусы при опросе, законно не
+        заметит ни одного изменения.
+        """
+        expected = set()
+        for index in range(self.students):
+            changes = {}
+            for position, (moment, number, status) in enumerate(
+                    self.events(index)):
+                if moment > now:
+                    break
+                changes.setdefault(number, []).append(
+                    (moment, position, status)
+                )
+            for history in changes.values():
+                ends = [moment for moment, _, _ in history[1:]] + [now]
+                visible = None
+                for (moment, position, status), end in zip(history, ends):
+                    if end - moment >= self.grace and status != visible:
+                        expected.add((index, position))
+                        visible = status
+        return expected
+
+    def _match(self, index, number, status, received):
+        """.
+        Позиция события, о котором сообщает уведомление, и задержка
+        уведомления: последнее к моменту `received` изменение работы на
+        статус `status`. Уведомление могло задержаться в очереди отправки,
+        поэтому статус работы к этому моменту мог снова измениться.
+        """
+        events = self.events(index)
+        end = bisect.bisect_right(events, (received, float('inf'), ''))
+        for position in range(end - 1, -1, -1):
+            moment, event_number, event_status = events[position]
+            if event_number == number and event_status == status:
+                return position, received - moment
+        return None
+
+    def report(self, now):
+        """.
+        Сверяет уведомления с расписаниями на момент `now` (но не позже
+        `horizon`): сколько обязательных уведомлений пропущено, сколько
+        пришло повторно и сколько не соответствует статусу работы.
+        """
+        now = min(now, self.horizon)
+        with self._lock:
+            notifications = list(self._notifications)
+        delivered = set()
+        duplicates = unexpected = 0
+        latencies = []
+        for index, number, status, received in notifications:
+            match = self._match(index, number, status, received)
+            if match is None:
+                unexpected += 1
+                continue
+            key = (index, match[0])
+            if key in delivered:
+                duplicates += 1
+                continue
+            delivered.add(key)
+            latencies.append(match[1])
+        expected = self._expected(now)
+        latencies.sort()
+        return {
+            'expected': len(expected),
+            'delivered': len(delivered),
+            'missed': len(expected - delivered),
+            'duplicates': duplicates,
+            'unexpected': unexpected,
+            'latency_p50_s': percentile(latencies, 0.5),
+            'latency_p99_s': percentile(latencies, 0.99),
+        }
+
+
+def resident_memory():
+    """Текущая резидентная память процесса в байтах."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Sampler:
+    """Фоновые замеры памяти и процессорного времени процесса бота."""
+
+    def __init__(self, interval):
+        """Создает остановленный сборщик замеров раз в `interval` секунд."""
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = None
+
+    def _sample(self):
+        self.samples.append({
+            'elapsed_s': round(time.perf_counter() - self._started, 1),
+            'rss_bytes': resident_memory(),
+            'cpu_s': round(time.process_time(), 2),
+        })
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """Делает первый замер и запускает фоновые замеры."""
+        self._started = time.perf_counter()
+        self._sample()
+        self._thread.start()
+
+    def stop(self):
+        """Делает последний замер и останавливает замеры."""
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+
+    def growth_per_hour(self):
+        """.
+        Наклон прямой, приближающей резидентную память по замерам,
+        в байтах в час.
+        """
+        points = [(s['elapsed_s'], s['rss_bytes']) for s in self.samples]
+        if len(points) < 2:
+            return 0
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+        if not variance:
+            return 0
+        slope = sum(
+            (x - mean_x) * (y - mean_y) for x, y in points
+        ) / variance
+        return slope * 3600
+
+
+def parse_args(args=None):
+    """Параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscriptions', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=600)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--poll-interval', type=float, default=30)
+    parser.add_argument('--review-time', type=float, default=300,
+                        help='средняя пауза между событиями студента, с')
+    parser.add_argument('--rejection-rate', type=float, default=0.4,
+                        help='доля проверок, завершившихся замечаниями')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка ответа заглушки Практикума, с')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='доля ответов 500 от заглушки Практикума')
+    parser.add_argument('--grace', type=float, default=None,
+                        help='сколько должен продержаться статус, чтобы '
+                             'уведомление о нем было обязательным, с '
+                             '(по умолчанию - два интервала опроса)')
+    parser.add_argument('--sample-interval', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести отчет в формате JSON')
+    return parser.parse_args(args)
+
+
+def run(args):
+    """Выполняет нагрузочный прогон и возвращает отчет-словарь."""
+    import api_session
+    import engine
+    import homework
+    from telegram import Bot
+
+    grace = args.grace if args.grace is not None else 2 * args.poll_interval
+    started_at = time.time()
+    timelines = Timelines(
+        args.subscriptions, started_at, started_at + args.duration,
+        args.review_time, args.rejection_rate, warmup=args.poll_interval,
+        grace=grace, seed=args.seed
+    )
+    stub_options = stubs.Options(
+        latency=args.latency, error_rate=args.error_rate,
+        started_at=started_at, scenario=timelines
+    )
+    process, endpoint, telegram_url = stubs.start(stub_options)
+    homework.ENDPOINT = endpoint
+    api_session.configure(pool_size=args.concurrency)
+    bot = Bot(token='123:load', base_url=f'{telegram_url}/bot')
+    sampler = Sampler(args.sample_interval)
+    try:
+        subscriptions = [
+            engine.Subscription(f'token-{index}', index)
+            for index in range(args.subscriptions)
+        ]
+        sampler.start()
+        with tempfile.TemporaryDirectory() as workdir:
+            asyncio.run(drive(
+                subscriptions, bot, vars(args), args.duration, workdir
+            ))
+        sampler.stop()
+        stats = stubs.fetch_stats(telegram_url)
+    finally:
+        process.terminate()
+    first, last = sampler.samples[0], sampler.samples[-1]
+    cpu = last['cpu_s'] - first['cpu_s']
+    elapsed = last['elapsed_s']
+    scenario = stats['scenario']
+    report = {
+        'subscriptions': args.subscriptions,
+        'duration_s': elapsed,
+        'polls': stats['requests'],
+        'polls_per_s': round(stats['requests'] / elapsed, 1),
+        'api_errors': stats['errors'],
+        'notifications': stats['notifications'],
+        'grace_s': grace,
+        'cpu_s': round(cpu, 2),
+        'cpu_percent_per_1k_subscriptions': round(
+            cpu / elapsed * 100 * 1000 / args.subscriptions, 2
+        ),
+        'rss_start_mb': round(first['rss_bytes'] / 2 ** 20, 1),
+        'rss_end_mb': round(last['rss_bytes'] / 2 ** 20, 1),
+        'rss_growth_mb_per_hour': round(
+            sampler.growth_per_hour() / 2 ** 20, 1
+        ),
+    }
+    report.update(scenario)
+    return report, sampler.samples
+
+
+def main(args=None):
+    """Точка входа нагрузочного прогона."""
+    args = parse_args(args)
+    logging.basicConfig(level=logging.WARNING)
+    report, samples = run(args)
+    if args.json:
+        print(json.dumps(dict(report, samples=samples), ensure_ascii=False))
+        return
+    for key, value in report.items():
+        print(f'{key:36} {value}')
+
+
+if __name__ == '__main__':
+    main()
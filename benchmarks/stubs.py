@@ -0,0 +1,294 @@
+"""Локальные заглушки API Практикум.Домашки и Telegram для бенчмарков.
+
+Заглушка Практикума для каждого токена `token-<i>` отдает историю из
+`history_size` работ. Самая новая работа `hw-<i>-0` меняет статус по
+детерминированному расписанию раз в `change_interval` секунд, поэтому
+обе заглушки без общего состояния знают, когда произошло каждое
+изменение. Заглушка Telegram принимает `sendMessage`, по тексту
+сообщения находит момент изменения статуса и считает задержку
+уведомления. Статистика доступна по адресу `/stats` заглушки Telegram.
+
+Вместо этого расписания заглушки могут обслуживать сценарий `scenario`
+(например, `benchmarks.loadgen.Timelines`): он выдает работы подписки,
+учитывает полученные уведомления и добавляет свой отчет в `/stats`.
+"""
+import json
+import multiprocessing
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUS_CYCLE = ('reviewing', 'rejected', 'reviewing', 'approved')
+VERDICTS = {
+    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    'reviewing': 'Работа взята на проверку ревьюером.',
+    'rejected': 'Работа проверена: у ревьюера есть замечания.',
+}
+HISTORY_START = 1_500_000_000
+
+
+class Options:
+    """Параметры заглушек."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, history_size=1,
+                 change_interval=60.0, started_at=None, scenario=None):
+        """Задает задержку ответа, долю ошибок 500 и размер истории."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.history_size = history_size
+        self.change_interval = change_interval
+        self.started_at = started_at if started_at is not None else time.time()
+        self.scenario = scenario
+
+
+def format_date(timestamp):
+    """Дата в формате поля `date_updated` API Практикума."""
+    return datetime.fromtimestamp(
+        int(timestamp), timezone.utc
+    ).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def phase(index, options):
+    """Сдвиг расписания подписки, чтобы изменения не шли одновременно."""
+    return (index * 7919) % 1000 / 1000 * options.change_interval
+
+
+def active_homework(index, now, options):
+    """.
+    Состояние изменяемой работы подписки `index` в момент `now`: номер
+    изменения, статус и время изменения. До первого изменения - `None`.
+    """
+    elapsed = now - options.started_at - phase(index, options)
+    if elapsed < 0:
+        return None
+    change = int(elapsed // options.change_interval)
+    changed_at = (
+        options.started_at + phase(index, options)
+        + change * options.change_interval
+    )
+    return change, STATUS_CYCLE[change % len(STATUS_CYCLE)], changed_at
+
+
+def homeworks(index, from_date, now, options):
+    """Список работ подписки, обновленных не раньше `from_date`."""
+    result = []
+    active = active_homework(index, now, options)
+    if active is not None:
+        _, status, changed_at = active
+        if int(changed_at) >= from_date:
+            result.append({
+                'id': index * options.history_size,
+                'homework_name': f'hw-{index}-0',
+                'status': status,
+                'date_updated': format_date(changed_at),
+                'lesson_name': 'Бенчмарк',
+                'reviewer_comment': '',
+            })
+    for number in range(1, options.history_size):
+        updated = HISTORY_START + number * 3600
+        if updated >= from_date:
+            result.append({
+                'id': index * options.history_size + number,
+                'homework_name': f'hw-{index}-{number}',
+                'status': 'approved',
+                'date_updated': format_date(updated),
+                'lesson_name': 'Бенчмарк',
+                'reviewer_comment': '',
+            })
+    return result
+
+
+def notification_latency(index, text, received, options):
+    """.
+    Задержка уведомления `text` об изменении работы `hw-<index>-0`,
+    полученного в момент `received`. Если уведомление сообщает не текущий
+    статус этой работы - `None`.
+    """
+    active = active_homework(index, received, options)
+    if active is None or f'"hw-{index}-0"' not in text:
+        return None
+    _, status, changed_at = active
+    if not text.endswith(VERDICTS[status]):
+        return None
+    return received - changed_at
+
+
+class Stats:
+    """Счетчики заглушек."""
+
+    def __init__(self):
+        """Создает пустую статистику."""
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.notifications = 0
+        self.latencies = []
+        self.last_request_at = None
+
+    def as_dict(self):
+        """Снимок статистики для `/stats`."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'bytes_sent': self.bytes_sent,
+                'notifications': self.notifications,
+                'latencies': latencies,
+                'last_request_at': self.last_request_at,
+            }
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, data, status=HTTPStatus.OK):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_practicum_handler(options, stats):
+    """Класс обработчика заглушки API Практикум.Домашки."""
+
+    class PracticumHandler(_JSONHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            token = self.headers.get('Authorization', '')
+            if not token.startswith('OAuth token-'):
+                self.send_json({'code': 'not_authenticated'},
+                               HTTPStatus.UNAUTHORIZED)
+                return
+            index = int(token[len('OAuth token-'):])
+            from_date = int(float(
+                parse_qs(url.query).get('from_date', ['0'])[0]
+            ))
+            if options.latency:
+                time.sleep(options.latency)
+            with stats.lock:
+                stats.requests += 1
+                stats.last_request_at = time.time()
+            if random.random() < options.error_rate:
+                with stats.lock:
+                    stats.errors += 1
+                self.send_json({}, HTTPStatus.INTERNAL_SERVER_ERROR)
+                return
+            now = time.time()
+            if options.scenario is not None:
+                items = options.scenario.homeworks(index, from_date, now)
+            else:
+                items = homeworks(index, from_date, now, options)
+            size = self.send_json({
+                'homeworks': items,
+                'current_date': int(now),
+            })
+            with stats.lock:
+                stats.bytes_sent += size
+
+    return PracticumHandler
+
+
+def make_telegram_handler(options, stats):
+    """Класс обработчика заглушки Telegram Bot API."""
+
+    class TelegramHandler(_JSONHandler):
+
+        def do_GET(self):
+            if self.path == '/stats':
+                result = stats.as_dict()
+                if options.scenario is not None:
+                    result['scenario'] = options.scenario.report(time.time())
+                self.send_json(result)
+            else:
+                self.send_json({'ok': False}, HTTPStatus.NOT_FOUND)
+
+        def do_POST(self):
+            received = time.time()
+            length = int(self.headers.get('Content-Length', 0))
+            raw = self.rfile.read(length).decode('utf-8')
+            if self.headers.get('Content-Type', '').startswith(
+                    'application/json'):
+                data = json.loads(raw)
+            else:
+                data = {
+                    key: values[0] for key, values in parse_qs(raw).items()
+                }
+            chat_id, text = data.get('chat_id'), data.get('text', '')
+            self.record(int(chat_id), text, received)
+            self.send_json({'ok': True, 'result': {
+                'message_id': 1,
+                'date': int(received),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'text': text,
+            }})
+
+        def record(self, index, text, received):
+            latency = None
+            if options.scenario is not None:
+                options.scenario.record(index, text, received)
+            else:
+                latency = notification_latency(index, text, received, options)
+            with stats.lock:
+                stats.notifications += 1
+                if latency is not None:
+                    stats.latencies.append(latency)
+
+    return TelegramHandler
+
+
+def serve(options, ready):
+    """Запускает обе заглушки и сообщает их порты через очередь `ready`."""
+    stats = Stats()
+    servers = [
+        ThreadingHTTPServer(
+            ('127.0.0.1', 0), make_practicum_handler(options, stats)
+        ),
+        ThreadingHTTPServer(
+            ('127.0.0.1', 0), make_telegram_handler(options, stats)
+        ),
+    ]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    ready.put(tuple(server.server_address[1] for server in servers))
+    threading.Event().wait()
+
+
+def start(options):
+    """.
+    Запускает заглушки в отдельном процессе, чтобы их работа не влияла на
+    замеры процессора и памяти бота. Возвращает процесс, адрес эндпоинта
+    Практикума и базовый URL Telegram Bot API.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(options, ready), daemon=True
+    )
+    process.start()
+    practicum_port, telegram_port = ready.get(timeout=10)
+    endpoint = (
+        f'http://127.0.0.1:{practicum_port}'
+        '/api/user_api/homework_statuses/'
+    )
+    telegram_url = f'http://127.0.0.1:{telegram_port}'
+    return process, endpoint, telegram_url
+
+
+def fetch_stats(telegram_url):
+    """Статистика заглушек."""
+    import requests
+
+    return requests.get(f'{telegram_url}/stats').json()
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from exceptions import (
+    CircuitOpenError, EndpointUnavailableError, RequestError, ResponseError
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+FAILURE_THRESHOLDS = {
+    EndpointUnavailableError: 3,
+    ResponseError: 5,
+    RequestError: 5,
+}
+
+
+class CircuitBreaker:
+    """.
+    Предохранитель для запросов к Практикум.Домашке, общий для всех подписок.
+    Размыкается, когда без единого успешного запроса накапливается заданное в
+    `thresholds` число ошибок одного класса. Пока предохранитель разомкнут,
+    вызовы завершаются `CircuitOpenError` без обращения к сервису. Через
+    `reset_timeout` секунд пропускается ровно один пробный запрос: успех
+    замыкает предохранитель, ошибка снова размыкает его.
+    """
+
+    def __init__(self, thresholds=None, reset_timeout=60,
+                 clock=time.monotonic):
+        """Создает замкнутый предохранитель."""
+        self.thresholds = thresholds or FAILURE_THRESHOLDS
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = {}
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        """Текущее состояние с учетом истекшего `reset_timeout`."""
+        with self._lock:
+            if (self._state == OPEN
+                    and self._clock() - self._opened_at >= self.reset_timeout):
+                return HALF_OPEN
+            return self._state
+
+    def _error_class(self, error):
+        for error_class in self.thresholds:
+            if isinstance(error, error_class):
+                return error_class
+        return None
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if (self._state == OPEN
+                    and self._clock() - self._opened_at >= self.reset_timeout):
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info('Пробный запрос к сервису Практикум.Домашка.')
+                return
+        raise CircuitOpenError(
+            'Запрос не выполнен: сервис Практикум.Домашка временно отключен '
+            'после серии ошибок.'
+        )
+
+    def _on_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info('Предохранитель замкнут: сервис снова доступен.')
+            self._state = CLOSED
+            self._failures.clear()
+            self._probing = False
+
+    def _on_failure(self, error):
+        error_class = self._error_class(error)
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            if error_class is None:
+                return
+            count = self._failures.get(error_class, 0) + 1
+            self._failures[error_class] = count
+            if count >= self.thresholds[error_class]:
+                self._open()
+
+    def _open(self):
+        logger.error(
+            'Предохранитель разомкнут: запросы к сервису Практикум.Домашка '
+            f'приостановлены на {self.reset_timeout} с.'
+        )
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._failures.clear()
+        self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """.
+        Выполняет блок `with` как один запрос через предохранитель. Нужен,
+        когда ответ читается потоком после вызова: ошибка чтения учитывается
+        как ошибка запроса, а успех - только после выхода из блока.
+        """
+        self._before_call()
+        try:
+            yield
+        except Exception as error:
+            self._on_failure(error)
+            raise
+        self._on_success()
+
+    def call(self, func, *args, **kwargs):
+        """Вызывает `func` через предохранитель."""
+        with self.guard():
+            return func(*args, **kwargs)
@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+from homework import TELEGRAM_MESSAGES
+from records import HomeworkRecord
+
+logger = logging.getLogger(__name__)
+
+STATUS_CACHE_TTL = 3600
+STATUS_CACHE_SIZE = 10000
+HISTORY_SIZE = 10
+LONG_POLL_TIMEOUT = 30
+ERROR_PAUSE = 5
+
+HELP_TEXT = (
+    'Доступные команды:\n'
+    '/status - статус последней обновленной работы;\n'
+    '/history - последние изменения статусов работ.'
+)
+NOT_SUBSCRIBED_TEXT = 'Этот чат не подписан на уведомления о работах.'
+NO_DATA_TEXT = (
+    'Свежих данных о работах пока нет: бот еще не опросил сервис '
+    'Практикум.Домашка. Попробуйте позже.'
+)
+
+
+def _keep_latest(homeworks, limit):
+    """.
+    Оставляет в словаре `{ключ работы: HomeworkRecord}` не более `limit`
+    работ с самой поздней датой обновления.
+    """
+    if len(homeworks) <= limit:
+        return homeworks
+    latest = sorted(
+        homeworks.items(), key=lambda item: item[1].updated_at, reverse=True
+    )[:limit]
+    return dict(latest)
+
+
+class _CacheEntry:
+
+    def __init__(self, homeworks, updated_at):
+        self.homeworks = homeworks
+        self.updated_at = updated_at
+
+
+class StatusCache:
+    """.
+    Кэш последних проверенных ответов API по подпискам, из которого бот
+    отвечает на команды пользователей без запросов к Практикум.Домашке.
+    Для каждой подписки хранится не более `history_size` работ с самой
+    поздней датой обновления; ответы опросов, которые возвращают только
+    изменения с `from_date`, дополняют запись. Пустой ответ с изменениями
+    только продлевает существующую запись: по нему нельзя узнать, есть ли
+    у пользователя работы. Запись, не обновлявшаяся
+    дольше `ttl` секунд, считается устаревшей и не отдается. Число записей
+    ограничено `max_size`: при переполнении вытесняется запись, к которой
+    дольше всего не обращались.
+    """
+
+    def __init__(self, ttl=STATUS_CACHE_TTL, max_size=STATUS_CACHE_SIZE,
+                 history_size=HISTORY_SIZE, clock=time.monotonic):
+        """Создает пустой кэш."""
+        self.ttl = ttl
+        self.max_size = max_size
+        self.history_size = history_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Количество записей в кэше."""
+        return len(self._entries)
+
+    def _expired(self, entry):
+        return self._clock() - entry.updated_at > self.ttl
+
+    def observe(self, key, homeworks, complete=False):
+        """.
+        Пропускает через себя работы `homeworks` (список или генератор) и,
+        когда они прочитаны целиком, записывает их в кэш подписки `key`.
+        `complete` означает, что ответ содержит всю историю работ, а не
+        только изменения. Прерванный разбор ответа кэш не изменяет.
+        """
+        collected = {}
+        for homework in homeworks:
+            record = HomeworkRecord.from_api(homework)
+            collected[record.key] = record
+            if len(collected) > 2 * self.history_size:
+                collected = _keep_latest(collected, self.history_size)
+            yield record
+        self.put(key, collected, complete)
+
+    def put(self, key, homeworks, complete=False):
+        """.
+        Дополняет запись подписки `key` работами из словаря
+        `{ключ работы: HomeworkRecord}`; устаревшая запись заменяется
+        целиком. Пустой словарь создает запись, только если он получен из
+        полной истории работ (`complete`).
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and self._expired(entry):
+                entry = None
+            if entry is None and not (homeworks or complete):
+                return
+            if entry is None:
+                merged = dict(homeworks)
+            else:
+                merged = entry.homeworks
+                merged.update(homeworks)
+            self._entries[key] = _CacheEntry(
+                _keep_latest(merged, self.history_size), self._clock()
+            )
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """.
+        Записи `HomeworkRecord` работ подписки `key`, начиная с самой поздней
+        по дате обновления. Если записи нет или она устарела - `None`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return sorted(
+                entry.homeworks.values(), key=lambda item: item.updated_at,
+                reverse=True
+            )
+
+
+def _describe(homework):
+    verdict = TELEGRAM_MESSAGES.get(
+        homework.status, f'Статус: {homework.status}.'
+    )
+    updated = datetime.fromtimestamp(homework.updated_at).strftime(
+        '%d.%m.%Y %H:%M'
+    )
+    return f'"{homework.name}" ({updated}): {verdict}'
+
+
+def format_status(homeworks):
+    """Ответ на команду `/status`."""
+    if not homeworks:
+        return 'Работы не найдены.'
+    return f'Последняя обновленная работа {_describe(homeworks[0])}'
+
+
+def format_history(homeworks):
+    """Ответ на команду `/history`."""
+    if not homeworks:
+        return 'История статусов пуста.'
+    return 'Последние изменения статусов:\n' + '\n'.join(
+        _describe(homework) for homework in homeworks
+    )
+
+
+COMMANDS = {
+    '/status': format_status,
+    '/history': format_history,
+}
+
+
+def parse_command(text):
+    """.
+    Имя команды из текста сообщения: `'/status@my_bot 1'` -> `'/status'`.
+    Для текста, не являющегося командой, - `None`.
+    """
+    if not text or not text.startswith('/'):
+        return None
+    return text.split()[0].split('@')[0].lower()
+
+
+class CommandListener:
+    """.
+    Получает сообщения боту через long polling (`getUpdates`) в фоновом
+    потоке и отвечает на команды `/status` и `/history` данными из кэша
+    `cache`. Ответы ставятся в очередь отправки `outbox` наравне с
+    уведомлениями и соблюдают те же лимиты Telegram. Запросов к
+    Практикум.Домашке команды не создают.
+    """
+
+    def __init__(self, bot, outbox, cache, subscriptions,
+                 timeout=LONG_POLL_TIMEOUT):
+        """.
+        Создает обработчик команд для чатов подписок `subscriptions`;
+        получение сообщений начинается после `start`.
+        """
+        self.bot = bot
+        self.outbox = outbox
+        self.cache = cache
+        self.timeout = timeout
+        self._chats = {}
+        self.set_subscriptions(subscriptions)
+        self._offset = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def set_subscriptions(self, subscriptions):
+        """Задает подписки, чатам которых бот отвечает на команды."""
+        chats = {}
+        for subscription in subscriptions:
+            chats.setdefault(str(subscription.chat_id), []).append(
+                subscription.key
+            )
+        self._chats = chats
+
+    def reply(self, chat_id, text):
+        """.
+        Текст ответа на сообщение `text` из чата `chat_id`. Для сообщений,
+        не являющихся командами, - `None`.
+        """
+        command = parse_command(text)
+        if command is None:
+            return None
+        formatter = COMMANDS.get(command)
+        if formatter is None:
+            return HELP_TEXT
+        keys = self._chats.get(str(chat_id))
+        if not keys:
+            return NOT_SUBSCRIBED_TEXT
+        replies = []
+        for key in keys:
+            homeworks = self.cache.get(key)
+            metrics.COMMANDS.labels(
+                command, 'miss' if homeworks is None else 'hit'
+            ).inc()
+            replies.append(
+                NO_DATA_TEXT if homeworks is None else formatter(homeworks)
+            )
+        return '\n\n'.join(replies)
+
+    def handle_update(self, update):
+        """Обрабатывает одно обновление Telegram."""
+        message = getattr(update, 'message', None)
+        if message is None:
+            return
+        text = self.reply(message.chat_id, message.text)
+        if text is not None:
+            self.outbox.send_message(message.chat_id, text)
+
+    def poll_once(self):
+        """Получает очередную пачку обновлений и обрабатывает их."""
+        updates = self.bot.get_updates(
+            offset=self._offset, timeout=self.timeout
+        )
+        for update in updates:
+            self._offset = update.update_id + 1
+            try:
+                self.handle_update(update)
+            except Exception as error:
+                metrics.count_error(error)
+                logger.error(f'Не удалось обработать команду: {error}')
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.poll_once()
+            except Exception as error:
+                metrics.count_error(error)
+                logger.error(f'Не удалось получить сообщения боту: {error}')
+                self._stopping.wait(ERROR_PAUSE)
+
+    def start(self):
+        """Запускает фоновый поток получения команд."""
+        self._thread = threading.Thread(
+            target=self._run, name='telegram-commands', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """.
+        Останавливает получение команд. Текущий запрос long polling не
+        прерывается: поток-демон завершится вместе с процессом.
+        """
+        self._stopping.set()
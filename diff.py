@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+from homework import REVIEWVING
+from records import HomeworkRecord
+
+StatusChange = namedtuple(
+    'StatusChange', ['key', 'homework', 'previous_status']
+)
+
+
+class HomeworkIndex:
+    """.
+    Индекс последних известных статусов работ подписки. Хранится между
+    опросами и позволяет находить изменения во всем списке `homeworks`
+    ответа за время, пропорциональное размеру ответа, а не истории.
+    """
+
+    def __init__(self, statuses=None):
+        """Создает индекс из словаря `{ключ работы: статус}`."""
+        self._statuses = dict(statuses or {})
+        self._reviewing = sum(
+            status == REVIEWVING for status in self._statuses.values()
+        )
+
+    def __len__(self):
+        """Количество работ в индексе."""
+        return len(self._statuses)
+
+    def __contains__(self, key):
+        """Есть ли в индексе работа с ключом `key`."""
+        return key in self._statuses
+
+    def status(self, key):
+        """Последний известный статус работы или `None`."""
+        return self._statuses.get(key)
+
+    @property
+    def reviewing(self):
+        """Хотя бы одна работа находится на проверке."""
+        return self._reviewing > 0
+
+    def iter_changes(self, homeworks):
+        """.
+        Выдает изменения `StatusChange` для работ из `homeworks`, статус
+        которых отличается от известного. `homeworks` может быть генератором:
+        работы просматриваются один раз и не накапливаются. Работы могут
+        быть записями `HomeworkRecord` или словарями из ответа API; в
+        изменении работа всегда представлена записью.
+        """
+        for homework in homeworks:
+            record = HomeworkRecord.from_api(homework)
+            previous_status = self._statuses.get(record.key)
+            if record.status != previous_status:
+                yield StatusChange(record.key, record, previous_status)
+
+    def diff(self, homeworks):
+        """.
+        Возвращает список изменений `StatusChange` для работ из `homeworks`.
+        Индекс не изменяется: каждое изменение подтверждается через `commit`
+        после отправки уведомления.
+        """
+        changes = {}
+        for change in self.iter_changes(homeworks):
+            changes[change.key] = change
+        return list(changes.values())
+
+    def commit(self, change):
+        """Записывает в индекс новый статус работы из изменения `change`."""
+        self.set_status(change.key, change.homework.status)
+
+    def set_status(self, key, status):
+        """Записывает в индекс статус `status` работы с ключом `key`."""
+        previous_status = self._statuses.get(key)
+        self._reviewing += (
+            (status == REVIEWVING) - (previous_status == REVIEWVING)
+        )
+        self._statuses[key] = status
+
+    def to_dict(self):
+        """Словарь `{ключ работы: статус}` для сохранения."""
+        return dict(self._statuses)
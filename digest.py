@@ -0,0 +1,150 @@
+import os
+import time
+
+ERROR_DIGEST_WINDOW = int(os.getenv('ERROR_DIGEST_WINDOW', 3600))
+STATUS_DIGEST_WINDOW = int(os.getenv('STATUS_DIGEST_WINDOW', 0))
+TIME_FORMAT = '%d.%m %H:%M:%S'
+
+
+def _format_time(timestamp):
+    return time.strftime(TIME_FORMAT, time.localtime(timestamp))
+
+
+class _ErrorGroup:
+
+    def __init__(self, timestamp):
+        self.count = 0
+        self.first = timestamp
+        self.last = timestamp
+
+
+class ErrorDigest:
+    """.
+    Сводка ошибок сервиса Практикум.Домашка одной подписки. Первая ошибка
+    инцидента сообщается пользователю сразу; последующие ошибки в течение
+    окна `window` секунд только подсчитываются по классам. Когда окно
+    закрыто, отправляется одно сообщение-сводка с числом ошибок каждого
+    класса и временем первой и последней из них. Сводка не отправляется,
+    если за окно не было ничего, кроме уже сообщенной ошибки.
+    """
+
+    def __init__(self, window=ERROR_DIGEST_WINDOW, clock=time.time):
+        """Создает сводку без открытого окна."""
+        self.window = window
+        self._clock = clock
+        self._opened_at = None
+        self._groups = {}
+
+    def __bool__(self):
+        """Открыто ли окно сводки."""
+        return self._opened_at is not None
+
+    def add(self, error):
+        """.
+        Учитывает ошибку `error`. Возвращает список сообщений для отправки:
+        сводку закрывшегося окна (если она нужна) и сообщение об ошибке,
+        если с нее начинается новое окно.
+        """
+        now = self._clock()
+        messages = self.flush()
+        if self._opened_at is None:
+            self._opened_at = now
+            messages.append(f'Сбой в работе программы: {error}')
+        name = type(error).__name__
+        group = self._groups.get(name)
+        if group is None:
+            group = self._groups[name] = _ErrorGroup(now)
+        group.count += 1
+        group.last = now
+        return messages
+
+    def to_dict(self):
+        """.
+        Состояние открытого окна для сохранения: время открытия и для
+        каждого класса ошибок число ошибок, время первой и последней.
+        """
+        if self._opened_at is None:
+            return {}
+        return {
+            'opened_at': self._opened_at,
+            'groups': {
+                name: [group.count, group.first, group.last]
+                for name, group in self._groups.items()
+            },
+        }
+
+    def restore(self, state):
+        """Восстанавливает окно из состояния, полученного `to_dict`."""
+        self._opened_at = state.get('opened_at')
+        self._groups = {}
+        for name, (count, first, last) in state.get('groups', {}).items():
+            group = self._groups[name] = _ErrorGroup(first)
+            group.count = count
+            group.last = last
+
+    def flush(self):
+        """.
+        Закрывает окно, если оно истекло. Возвращает список из сводки
+        закрытого окна или пустой список.
+        """
+        if (self._opened_at is None
+                or self._clock() - self._opened_at < self.window):
+            return []
+        groups, self._groups = self._groups, {}
+        opened_at, self._opened_at = self._opened_at, None
+        if sum(group.count for group in groups.values()) <= 1:
+            return []
+        lines = [
+            f'Сводка ошибок с {_format_time(opened_at)} по '
+            f'{_format_time(max(g.last for g in groups.values()))}:'
+        ]
+        for name, group in groups.items():
+            lines.append(
+                f'{name}: {group.count} раз(а), первая в '
+                f'{_format_time(group.first)}, последняя в '
+                f'{_format_time(group.last)}.'
+            )
+        return ['\n'.join(lines)]
+
+
+class StatusDigest:
+    """.
+    Окно объединения уведомлений об изменении статусов одной подписки.
+    Выключено, если `window` равно нулю. Первое обнаруженное изменение
+    открывает окно на `window` секунд; пока оно открыто, уведомления не
+    отправляются. Изменения не накапливаются: каждый опрос заново сравнивает
+    ответ API с подтвержденными статусами, поэтому после закрытия окна
+    отправляется одно сообщение с последним статусом каждой изменившейся
+    работы.
+    """
+
+    def __init__(self, window=STATUS_DIGEST_WINDOW, clock=time.time):
+        """Создает окно, которое еще не открыто."""
+        self.window = window
+        self._clock = clock
+        self._opened_at = None
+
+    def __bool__(self):
+        """Открыто ли окно."""
+        return self._opened_at is not None
+
+    def hold(self):
+        """.
+        Нужно ли отложить отправку обнаруженных изменений. Открывает окно,
+        если оно еще не открыто.
+        """
+        if self.window <= 0:
+            return False
+        now = self._clock()
+        if self._opened_at is None:
+            self._opened_at = now
+        return now - self._opened_at < self.window
+
+    def reset(self):
+        """Закрывает окно: изменения отправлены или больше не актуальны."""
+        self._opened_at = None
+
+    @staticmethod
+    def combine(messages):
+        """Одно сообщение из уведомлений об изменениях нескольких работ."""
+        return '\n\n'.join(messages)
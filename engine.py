@@ -0,0 +1,584 @@
+import asyncio
+import hashlib
+import json
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import api_session
+import logs
+import metrics
+from digest import ErrorDigest, StatusDigest
+from profiling import PROFILER
+from records import HomeworkRecord
+from diff import HomeworkIndex
+from exceptions import (
+    CircuitOpenError, HomeworkServiceError, SendMessageError
+)
+from homework import (
+    check_response, get_homework_statuses, parse_status, send_chat_message
+)
+from scheduler import CHANGED, FAILED, UNCHANGED
+from sharding import HEARTBEAT_INTERVAL
+from streaming import stream_homework_statuses
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_WINDOW = 3600
+WATERMARK_OVERLAP = 300
+
+
+class Subscription:
+    """.
+    Подписка одного пользователя: токен Практикум.Домашки, telegram-чат для
+    уведомлений и состояние опроса (временная метка, индекс статусов работ,
+    сводка ошибок, расписание опроса, время последнего изменения статуса и
+    окно объединения уведомлений).
+    """
+
+    __slots__ = (
+        'practicum_token', 'chat_id', 'current_timestamp', 'homeworks',
+        'errors', 'poll_delay', 'next_poll_at', 'changed_at', 'pending'
+    )
+
+    def __init__(self, practicum_token, chat_id):
+        """Создает подписку с пустым состоянием опроса."""
+        self.practicum_token = practicum_token
+        self.chat_id = chat_id
+        self.current_timestamp = 0
+        self.homeworks = HomeworkIndex()
+        self.errors = ErrorDigest()
+        self.poll_delay = None
+        self.next_poll_at = None
+        self.changed_at = None
+        self.pending = StatusDigest()
+
+    @property
+    def reviewing(self):
+        """Хотя бы одна известная работа находится на проверке."""
+        return self.homeworks.reviewing
+
+    def prioritized(self, window=PRIORITY_WINDOW):
+        """.
+        Опрос подписки срочный: работа на проверке или статус менялся
+        за последние `window` секунд.
+        """
+        return self.reviewing or (
+            self.changed_at is not None
+            and time.time() - self.changed_at < window
+        )
+
+    @property
+    def key(self):
+        """Ключ подписки для хранилища состояния, не раскрывающий токен."""
+        token_hash = hashlib.sha256(
+            str(self.practicum_token).encode()
+        ).hexdigest()[:16]
+        return f'{token_hash}:{self.chat_id}'
+
+    def __repr__(self):
+        """Представление подписки без токена для логов."""
+        return f'Subscription(chat_id={self.chat_id!r})'
+
+
+def load_subscriptions(path):
+    """.
+    Загружает подписки из JSON-файла со списком объектов вида
+    `{"practicum_token": "...", "chat_id": "..."}`.
+    """
+    with open(path, encoding='utf-8') as file:
+        items = json.load(file)
+    return [
+        Subscription(item['practicum_token'], item['chat_id'])
+        for item in items
+    ]
+
+
+def advance_watermark(watermark, current_date, overlap=WATERMARK_OVERLAP):
+    """.
+    Новое значение `from_date` после того, как ответ с временем сервера
+    `current_date` полностью обработан. Отметка строится только по часам
+    сервера, поэтому не зависит от часов и часового пояса бота, и отстает
+    от `current_date` на окно перекрытия `overlap` секунд: работы, которые
+    сервер записал с задержкой, попадут в следующий ответ, а повторно
+    полученные работы отсеет индекс статусов. Отметка никогда не уменьшается;
+    при некорректном `current_date` она не изменяется.
+    """
+    try:
+        server_time = int(current_date)
+    except (TypeError, ValueError):
+        return watermark
+    return max(watermark, server_time - overlap)
+
+
+def _current_date(response):
+    """Время сервера из ответа API или прочитанного потока."""
+    if isinstance(response, dict):
+        return response.get('current_date')
+    return response.current_date
+
+
+def _fetch_homeworks(subscription):
+    """.
+    Запрашивает и проверяет список работ подписки и возвращает записи
+    `HomeworkRecord` вместе с исходным ответом, из которого после обработки
+    берется время сервера. Первый запрос, который возвращает всю историю
+    работ, разбирается потоково: вместо списка возвращается итератор записей,
+    и ответ читается по мере обхода итератора.
+    """
+    args = (subscription.practicum_token, subscription.current_timestamp)
+    fetch = get_homework_statuses
+    if not subscription.current_timestamp:
+        fetch = stream_homework_statuses
+    with metrics.STAGE_LATENCY.labels('get_api_answer').time():
+        response = fetch(*args)
+    if fetch is stream_homework_statuses:
+        return map(HomeworkRecord.from_api, response), response
+    with metrics.STAGE_LATENCY.labels('check_response').time():
+        return [
+            HomeworkRecord.from_api(homework)
+            for homework in check_response(response)
+        ], response
+
+
+def _find_changes(subscription, homeworks):
+    """.
+    Находит изменения статусов работ. При первом опросе новой подписки API
+    возвращает всю историю работ; как и раньше, пользователь получает
+    уведомление только о последней обновленной работе, а остальные статусы
+    записываются в индекс молча после того, как история прочитана целиком.
+    Первым считается только опрос с нулевой временной меткой: если история
+    была пустой, обо всех работах из следующих ответов сообщается.
+    """
+    if subscription.current_timestamp or subscription.homeworks:
+        return subscription.homeworks.diff(homeworks)
+    latest = None
+    silent = []
+    for change in subscription.homeworks.iter_changes(homeworks):
+        if (latest is not None and change.homework.updated_at
+                < latest.homework.updated_at):
+            silent.append((change.key, change.homework.status))
+            continue
+        if latest is not None:
+            silent.append((latest.key, latest.homework.status))
+        latest = change
+    for key, status in silent:
+        subscription.homeworks.set_status(key, status)
+    return [latest] if latest is not None else []
+
+
+def _send_combined(subscription, bot, changes):
+    """.
+    Отправляет одно сообщение о последних статусах всех работ, изменившихся
+    за окно объединения, и подтверждает изменения в индексе.
+    """
+    messages = []
+    for change in changes:
+        with metrics.STAGE_LATENCY.labels('parse_status').time():
+            messages.append(parse_status(change.homework))
+    logger.info(f'Изменились статусы работ: {len(messages)}')
+    send_chat_message(
+        bot, subscription.chat_id, StatusDigest.combine(messages)
+    )
+    for change in changes:
+        subscription.homeworks.commit(change)
+
+
+def _send_changes(subscription, bot, store, changes, watermark):
+    """.
+    Отправляет уведомления об изменениях и подтверждает каждое из них в
+    индексе. Если изменения копились в окне объединения, отправляется одно
+    общее сообщение. Временная метка сдвигается до `watermark`, только когда
+    отправлены все уведомления, чтобы неотправленные изменения были
+    получены повторно.
+    """
+    if subscription.pending:
+        _send_combined(subscription, bot, changes)
+    else:
+        for change in changes:
+            with metrics.STAGE_LATENCY.labels('parse_status').time():
+                message = parse_status(change.homework)
+            logger.info('Изменился статус работы')
+            send_chat_message(bot, subscription.chat_id, message)
+            subscription.homeworks.commit(change)
+            if store is not None:
+                store.save(subscription)
+    subscription.pending.reset()
+    subscription.current_timestamp = watermark
+    if store is not None:
+        store.save(subscription)
+
+
+def _report_errors(subscription, bot, store, messages, changed=False):
+    """.
+    Отправляет сообщения об ошибках и сводки ошибок подписки. Состояние
+    подписки вместе со сводкой сохраняется, если что-то отправлено или
+    сводка изменилась (`changed`), чтобы после перезапуска не сообщать
+    повторно о первой ошибке продолжающегося сбоя.
+    """
+    for message in messages:
+        send_chat_message(bot, subscription.chat_id, message)
+    if (messages or changed) and store is not None:
+        store.save(subscription)
+
+
+def poll_subscription(subscription, bot, store=None, breaker=None,
+                      cache=None):
+    """.
+    Один цикл опроса подписки: запрос к API, проверка ответа и отправка
+    уведомления по каждой работе, статус которой изменился. После каждой
+    успешной отправки состояние подписки сохраняется в `store`, если оно
+    передано. Запрос к API вместе с чтением ответа выполняется через общий
+    предохранитель `breaker`, если он передан: сбой потокового чтения
+    учитывается так же, как сбой запроса. Возвращает результат опроса для
+    планировщика: `CHANGED`, `UNCHANGED` или `FAILED`. Проверенный ответ
+    записывается в кэш статусов `cache`, если он передан. Следующий запрос
+    выполняется с `from_date` по времени сервера из ответа, поэтому
+    возвращает только изменения с прошлого опроса (см. `advance_watermark`).
+    Если включено окно объединения (`STATUS_DIGEST_WINDOW`), изменения не
+    подтверждаются, пока окно открыто, и после его закрытия отправляются
+    одним сообщением с последним статусом каждой работы. Об ошибках сервиса
+    пользователь узнает через сводку ошибок подписки: сразу о первой ошибке
+    и одним сообщением об остальных, когда окно сводки закроется.
+    """
+    try:
+        _report_errors(
+            subscription, bot, store, subscription.errors.flush()
+        )
+        with nullcontext() if breaker is None else breaker.guard():
+            homeworks, response = _fetch_homeworks(subscription)
+            if cache is not None:
+                homeworks = cache.observe(
+                    subscription.key, homeworks,
+                    complete=not subscription.current_timestamp
+                )
+            changes = _find_changes(subscription, homeworks)
+            watermark = advance_watermark(
+                subscription.current_timestamp, _current_date(response)
+            )
+        if not changes:
+            logger.debug('Статус работы не изменился.')
+            subscription.pending.reset()
+            subscription.current_timestamp = watermark
+            return UNCHANGED
+        if subscription.pending.hold():
+            logger.debug('Уведомления отложены до закрытия окна объединения.')
+            return CHANGED
+        _send_changes(subscription, bot, store, changes, watermark)
+        return CHANGED
+    except CircuitOpenError as error:
+        metrics.count_error(error)
+        logger.debug('Опрос пропущен: %s', error)
+    except HomeworkServiceError as error:
+        metrics.count_error(error)
+        logger.error(error)
+        _report_errors(
+            subscription, bot, store, subscription.errors.add(error),
+            changed=True
+        )
+    except SendMessageError as error:
+        metrics.count_error(error)
+        logger.error(error)
+    return FAILED
+
+
+def _claim(subscription, shard, store):
+    """.
+    Берет аренду подписки у координатора `shard`. Если подписка только что
+    перешла к этому процессу, ее состояние перечитывается из `store`: его
+    мог изменить предыдущий владелец.
+    """
+    held = shard.holds(subscription.key)
+    if not shard.acquire(subscription.key):
+        return False
+    if not held and store is not None:
+        store.load(subscription)
+    return True
+
+
+def _poll_owned(subscription, bot, store, breaker, cache, shard):
+    """.
+    Опрашивает подписку, если она принадлежит этому процессу. Для чужой
+    подписки возвращает `None`. Записи журнала помечаются ключом подписки,
+    а цикл профилируется, если профилирование запрошено. Запросы опроса
+    укладываются в срок `api_session.POLL_DEADLINE`.
+    """
+    with logs.subscription_context(subscription.key), PROFILER.cycle():
+        if shard is not None and not _claim(subscription, shard, store):
+            return None
+        with api_session.deadline(api_session.POLL_DEADLINE):
+            return poll_subscription(
+                subscription, bot, store, breaker, cache
+            )
+
+
+async def _maintain_shard(shard, executor, period):
+    """Отмечает процесс у координатора `shard` каждые `period` секунд."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(period)
+        try:
+            await loop.run_in_executor(executor, shard.heartbeat)
+        except Exception as error:
+            metrics.count_error(error)
+            logger.error(f'Не удалось обновить список процессов: {error}')
+
+
+class Poller:
+    """.
+    Опрос подписок в одном процессе. Одновременно выполняется не более
+    `concurrency` запросов; паузы между опросами подбирает планировщик
+    `interval`. Состояние подписок восстанавливается из `store`, ответы API
+    записываются в кэш статусов `cache`, предохранитель `breaker` общий для
+    всех подписок, а координатор `shard` оставляет процессу только его часть
+    подписок. Если передан общий бюджет запросов `budget`, каждый опрос
+    расходует из него токен; при нехватке бюджета опросы подписок без работ
+    на проверке и без недавних изменений откладываются.
+
+    Остановка (`stop`, SIGTERM или SIGINT) не прерывает начатые опросы: они
+    завершаются, после чего состояние и расписание всех подписок
+    сохраняется в `store`. Следующий процесс продолжает опрос по этому
+    расписанию, не опрашивая все подписки заново при запуске. По SIGHUP
+    вызывается `reload`, который возвращает новый список подписок и
+    планировщик: подписки добавляются и удаляются без перезапуска, а
+    состояние оставшихся сохраняется.
+    """
+
+    def __init__(self, bot, concurrency, interval, store=None, breaker=None,
+                 cache=None, shard=None, budget=None, reload=None):
+        """Создает остановленный опрос."""
+        self.bot = bot
+        self.concurrency = concurrency
+        self.interval = interval
+        self.store = store
+        self.breaker = breaker
+        self.cache = cache
+        self.shard = shard
+        self.budget = budget
+        self.reload = reload
+        self._subscriptions = {}
+        self._tasks = {}
+        self._executor = None
+        self._semaphore = None
+        self._stopped = None
+
+    @property
+    def subscriptions(self):
+        """Опрашиваемые подписки."""
+        return list(self._subscriptions.values())
+
+    def _start_delay(self, subscription, index, count):
+        """.
+        Задержка первого опроса подписки: по сохраненному расписанию, а для
+        новых подписок и просроченного расписания - равномерно по начальному
+        интервалу, чтобы не создавать всплеск нагрузки при запуске.
+        """
+        if subscription.next_poll_at is not None:
+            delay = subscription.next_poll_at - time.time()
+            if delay > 0:
+                return delay
+        return index * self.interval.initial / count
+
+    def _spawn(self, subscriptions):
+        new = [s for s in subscriptions if s.key not in self._subscriptions]
+        if self.store is not None:
+            restored = sum(self.store.load(s) for s in new)
+            logger.info(f'Восстановлено состояние подписок: {restored}.')
+        for index, subscription in enumerate(new):
+            self._subscriptions[subscription.key] = subscription
+            self._tasks[subscription.key] = asyncio.ensure_future(
+                self._poll_forever(
+                    subscription, self._start_delay(subscription, index,
+                                                    len(new))
+                )
+            )
+        metrics.SUBSCRIPTIONS.set(len(self._subscriptions))
+
+    def update(self, subscriptions, interval=None):
+        """.
+        Заменяет список подписок и, если передан, планировщик. Опрос новых
+        подписок начинается, удаленных - прекращается.
+        """
+        if interval is not None:
+            self.interval = interval
+        keys = {subscription.key for subscription in subscriptions}
+        for key in list(self._subscriptions):
+            if key not in keys:
+                self._tasks.pop(key).cancel()
+                del self._subscriptions[key]
+        self._spawn(subscriptions)
+        logger.info(f'Подписок после обновления: {len(self._subscriptions)}.')
+
+    async def _reload(self):
+        try:
+            subscriptions, interval = await asyncio.get_running_loop(
+            ).run_in_executor(self._executor, self.reload)
+        except Exception as error:
+            metrics.count_error(error)
+            logger.error(f'Не удалось перечитать настройки: {error}')
+            return
+        self.update(subscriptions, interval)
+
+    def stop(self):
+        """Останавливает опрос после завершения начатых опросов."""
+        if self._stopped is None or self._stopped.is_set():
+            return
+        logger.info('Остановка: завершаются начатые опросы.')
+        self._stopped.set()
+        for task in self._tasks.values():
+            task.cancel()
+
+    async def _poll(self, subscription):
+        """.
+        Один опрос в пуле потоков. Если задачу отменяют во время опроса (в том
+        числе повторно), опрос все равно доводится до конца, а следующий
+        опрос назначается по его исходу, чтобы расписание попало в
+        сохраняемое состояние.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, _poll_owned, subscription, self.bot, self.store,
+            self.breaker, self.cache, self.shard
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            while not future.done():
+                try:
+                    await asyncio.wait([future])
+                except asyncio.CancelledError:
+                    continue
+            if (not future.cancelled() and future.exception() is None
+                    and future.result() is not None):
+                self._schedule(subscription, future.result())
+            raise
+
+    async def _spend_budget(self, subscription):
+        """.
+        Ждет разрешения на запрос из общего бюджета. Срочные подписки
+        получают его за счет резерва, остальные ждут пополнения бюджета.
+        """
+        if self.budget is None:
+            return
+        deferred = False
+        while True:
+            wait = self.budget.try_acquire(subscription.prioritized())
+            if not wait:
+                return
+            if not deferred:
+                deferred = True
+                metrics.BUDGET_DEFERRED.inc()
+            await asyncio.sleep(wait)
+
+    def _schedule(self, subscription, outcome):
+        """Назначает следующий опрос подписки по исходу текущего."""
+        metrics.POLLS.labels(outcome).inc()
+        if outcome == CHANGED:
+            subscription.changed_at = time.time()
+        subscription.poll_delay = self.interval.next_delay(
+            subscription.poll_delay, outcome, subscription.reviewing
+        )
+        subscription.next_poll_at = time.time() + subscription.poll_delay
+
+    async def _poll_forever(self, subscription, start_delay):
+        """.
+        Бесконечно опрашивает подписку. Подписку, принадлежащую другому
+        процессу, только периодически проверяет с минимальным интервалом.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(start_delay)
+        if subscription.poll_delay is None:
+            subscription.poll_delay = self.interval.initial
+        while True:
+            if (self.shard is not None
+                    and not self.shard.owns(subscription.key)):
+                await asyncio.sleep(self.interval.floor)
+                continue
+            due = loop.time()
+            await self._spend_budget(subscription)
+            async with self._semaphore:
+                metrics.POLL_LAG.observe(loop.time() - due)
+                try:
+                    outcome = await self._poll(subscription)
+                except Exception as error:
+                    metrics.count_error(error)
+                    logger.exception(
+                        f'Непредвиденная ошибка при опросе {subscription}: '
+                        f'{error}'
+                    )
+                    outcome = FAILED
+            if outcome is None:
+                await asyncio.sleep(self.interval.floor)
+                continue
+            self._schedule(subscription, outcome)
+            await asyncio.sleep(subscription.poll_delay)
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for name in ('SIGTERM', 'SIGINT'):
+            if hasattr(signal, name):
+                loop.add_signal_handler(getattr(signal, name), self.stop)
+        if self.reload is not None and hasattr(signal, 'SIGHUP'):
+            loop.add_signal_handler(
+                signal.SIGHUP, lambda: asyncio.ensure_future(self._reload())
+            )
+
+    async def run(self, subscriptions, handle_signals=False):
+        """.
+        Опрашивает подписки до остановки. При `handle_signals` остановка и
+        перечитывание настроек выполняются по сигналам.
+        """
+        self._stopped = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            self._executor = executor
+            if handle_signals:
+                self._install_signal_handlers()
+            maintenance = None
+            if self.shard is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    executor, self.shard.heartbeat
+                )
+                maintenance = asyncio.ensure_future(
+                    _maintain_shard(self.shard, executor, HEARTBEAT_INTERVAL)
+                )
+            self._spawn(subscriptions)
+            try:
+                await self._stopped.wait()
+            finally:
+                self._stopped.set()
+                if maintenance is not None:
+                    maintenance.cancel()
+                for task in self._tasks.values():
+                    task.cancel()
+                await asyncio.gather(
+                    *self._tasks.values(), return_exceptions=True
+                )
+                self._snapshot()
+
+    def _snapshot(self):
+        """.
+        Сохраняет состояние и расписание подписок, которые опрашивал этот
+        процесс. Копии чужих подписок при разделении между процессами
+        устарели и не должны затирать состояние, сохраненное владельцем.
+        """
+        if self.store is None:
+            return
+        subscriptions = [
+            subscription for subscription in self.subscriptions
+            if self.shard is None or self.shard.holds(subscription.key)
+        ]
+        self.store.save_many(subscriptions)
+        logger.info(f'Сохранено состояние подписок: {len(subscriptions)}.')
+
+
+async def run(subscriptions, bot, concurrency, interval, store=None,
+              breaker=None, cache=None, shard=None, budget=None):
+    """.
+    Опрашивает все подписки в одном процессе до отмены (см. `Poller`).
+    """
+    await Poller(
+        bot, concurrency, interval, store, breaker, cache, shard, budget
+    ).run(subscriptions)
@@ -51,3 +51,26 @@ class WrongStatusError(HomeworkServiceError):
     pass
 
 
+class CircuitOpenError(HomeworkServiceError):
+    """.
+    Исключение возникает, если запрос к сервису Практикум.Домашка не
+    выполнялся, потому что предохранитель разомкнут после серии ошибок
+    сервиса.
+    """
+    pass
+
+
+class DeadlineExceededError(RequestError):
+    """.
+    Исключение возникает, если опрос не уложился в отведенное ему время и
+    запрос к сервису Практикум.Домашка был прерван.
+    """
+    pass
+
+
+class InvalidHomeworkError(HomeworkServiceError):
+    """.
+    Исключение возникает, если работа в ответе сервиса Практикум.Домашка не
+    является словарем или содержит некорректное время обновления.
+    """
+    pass
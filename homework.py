@@ -1,16 +1,14 @@
 import logging
 import os
 import sys
-import time
-from datetime import datetime
+from datetime import datetime, timezone
 from http import HTTPStatus
 
-import requests
 from dotenv import load_dotenv
-from telegram import Bot
 
+import api_session
 from exceptions import (
-    EndpointUnavailableError, HomeworkServiceError, MissingTokenError,
+    EndpointUnavailableError, MissingTokenError,
     ResponseError, RequestError, SendMessageError, WrongStatusError
 )
 
@@ -21,8 +19,36 @@ load_dotenv()
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', 5))
+TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', 10))
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+STATE_DB = os.getenv('STATE_DB', 'homework_bot.sqlite3')
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/aa'
+POLL_INTERVAL_FLOOR = int(os.getenv('POLL_INTERVAL_FLOOR', 60))
+POLL_INTERVAL_CEILING = int(os.getenv('POLL_INTERVAL_CEILING', 1800))
+OUTBOX_FLUSH_TIMEOUT = 30
+CIRCUIT_RESET_TIMEOUT = int(os.getenv('CIRCUIT_RESET_TIMEOUT', 60))
+METRICS_PORT = os.getenv('METRICS_PORT')
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 100))
+PRACTICUM_RATE_LIMIT = float(os.getenv('PRACTICUM_RATE_LIMIT', 0))
+PRACTICUM_RATE_BURST = float(os.getenv('PRACTICUM_RATE_BURST', 0))
+TELEGRAM_COMMANDS = os.getenv('TELEGRAM_COMMANDS', '').lower() in (
+    '1', 'true', 'yes'
+)
+STATUS_CACHE_TTL = int(os.getenv('STATUS_CACHE_TTL', 3600))
+STATUS_CACHE_SIZE = int(os.getenv('STATUS_CACHE_SIZE', 10000))
+SHARDED = os.getenv('SHARDED', '').lower() in ('1', 'true', 'yes')
+SHARD_DB = os.getenv('SHARD_DB', STATE_DB)
+WORKER_ID = os.getenv('WORKER_ID')
+RECORD_FILE = os.getenv('RECORD_FILE')
+PROFILE_CYCLES = int(os.getenv('PROFILE_CYCLES', 100))
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/aa'
+)
 
 APPROVED = 'approved'
 REVIEWVING = 'reviewing'
@@ -36,9 +62,14 @@ TELEGRAM_MESSAGES = {
 
 def send_message(bot, message):
     """Отправляет сообщение `message` в указанный telegram-чат."""
+    send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_chat_message(bot, chat_id, message):
+    """Отправляет сообщение `message` в telegram-чат `chat_id`."""
     try:
         logger.info('Попытка отправить сообщение в Telegram отправлено.')
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        bot.send_message(chat_id, message)
         logger.info('Сообщение в Telegram успешно отправлено.')
     except Exception:
         raise SendMessageError('Не удалось отправить сообщение в Telegram.')
@@ -50,13 +81,32 @@ def get_api_answer(current_timestamp):
     В случае успешного запроса возвращает ответ API, приведенный к типам
     данных Python.
     """
-    headers = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+    return get_homework_statuses(PRACTICUM_TOKEN, current_timestamp)
+
+
+def get_homework_statuses(token, current_timestamp):
+    """.
+    Запрос к `API Yandex Practicum` от имени владельца токена `token`.
+    Используется как для единственного пользователя из переменных окружения,
+    так и для каждой подписки многопользовательского режима.
+    """
+    return request_homework_statuses(token, current_timestamp).json()
+
+
+def request_homework_statuses(token, current_timestamp, stream=False):
+    """.
+    Выполняет запрос к `API Yandex Practicum` и проверяет код ответа.
+    Возвращает объект ответа; при `stream=True` тело ответа еще не прочитано.
+    """
+    headers = {'Authorization': f'OAuth {token}'}
     params = {'from_date': current_timestamp}
+    request_kwargs = {'stream': True} if stream else {}
     try:
-        homework_statuses = requests.get(
+        homework_statuses = api_session.get(
             ENDPOINT,
             headers=headers,
-            params=params
+            params=params,
+            **request_kwargs
         )
 
         if homework_statuses.status_code == HTTPStatus.NOT_FOUND:
@@ -70,9 +120,9 @@ def get_api_answer(current_timestamp):
                 f'Код ответа: {homework_statuses.status_code}.'
             )
 
-        return homework_statuses.json()
+        return homework_statuses
 
-    except requests.exceptions.RequestException as error:
+    except api_session.request_exceptions() as error:
         raise RequestError(
             f'Сбой при запросе к сервису Практикум.Домашка: {error}.'
         )
@@ -81,7 +131,8 @@ def get_api_answer(current_timestamp):
 def check_response(response):
     """.
     Проверка ответа API на корректность. При успешной проверке возвращает
-    список домашних работ, доступный в ответе по ключу `homeworks`.
+    список домашних работ, доступный в ответе по ключу `homeworks`. Пустой
+    список - штатный ответ, если с `from_date` ничего не изменилось.
     """
     if not isinstance(response, dict):
         raise TypeError(
@@ -91,7 +142,7 @@ def check_response(response):
     if not response.get('current_date'):
         raise KeyError('В полученном ответе отсутствует ключ `current_date`.')
 
-    if not response.get('homeworks'):
+    if 'homeworks' not in response:
         raise KeyError('В полученном ответе отсутствует ключ `homeworks`.')
 
     homeworks = response.get('homeworks')
@@ -101,9 +152,6 @@ def check_response(response):
             f'Ответ сервиса: {homeworks}'
         )
 
-    if not homeworks:
-        raise IndexError('Значение по ключу `homeworks` - пустой список.')
-
     return homeworks
 
 
@@ -138,59 +186,178 @@ def check_tokens():
 def get_timestamp(report) -> int:
     """.
     Функция в качестве параметра получает работу и возвращает время
-    последнего изменения статуса этой работы в формате Unix time.
+    последнего изменения статуса этой работы в формате Unix time. Время в
+    ответе API указано в UTC и не зависит от часового пояса бота.
     """
     report_update_date = report.get('date_updated')
     report_update_datetime = datetime.strptime(
         report_update_date, '%Y-%m-%dT%H:%M:%SZ'
-    )
+    ).replace(tzinfo=timezone.utc)
     report_update_timestamp = int(report_update_datetime.timestamp())
     return report_update_timestamp
 
 
+def create_bot():
+    """.
+    Создает telegram-бота с таймаутами подключения и чтения. Тяжелый пакет
+    `telegram` импортируется здесь, а не при загрузке модуля. Пул из двух
+    соединений позволяет отправлять сообщения во время long polling команд.
+    """
+    from telegram import Bot
+    from telegram.utils.request import Request
+
+    request = Request(
+        con_pool_size=2,
+        connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=TELEGRAM_READ_TIMEOUT
+    )
+    if TELEGRAM_API_URL:
+        return Bot(
+            token=TELEGRAM_TOKEN, base_url=TELEGRAM_API_URL, request=request
+        )
+    return Bot(token=TELEGRAM_TOKEN, request=request)
+
+
+def configured_subscriptions():
+    """Подписки из `SUBSCRIPTIONS_FILE` или из переменных окружения."""
+    import engine
+
+    if SUBSCRIPTIONS_FILE:
+        return engine.load_subscriptions(SUBSCRIPTIONS_FILE)
+    return [engine.Subscription(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+
+
+def poll_interval():
+    """Планировщик интервала опроса с текущими настройками."""
+    from scheduler import AdaptiveInterval
+
+    return AdaptiveInterval(
+        POLL_INTERVAL_FLOOR, POLL_INTERVAL_CEILING, initial=RETRY_TIME
+    )
+
+
+def reload_configuration(listener=None):
+    """.
+    Перечитывает `.env` и возвращает подписки и планировщик с новыми
+    настройками. Обработчик команд `listener`, если он передан, начинает
+    отвечать новым подпискам.
+    """
+    global PRACTICUM_TOKEN, TELEGRAM_CHAT_ID, SUBSCRIPTIONS_FILE
+    global POLL_INTERVAL_FLOOR, POLL_INTERVAL_CEILING
+    load_dotenv(override=True)
+    PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
+    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+    POLL_INTERVAL_FLOOR = int(os.getenv('POLL_INTERVAL_FLOOR', 60))
+    POLL_INTERVAL_CEILING = int(os.getenv('POLL_INTERVAL_CEILING', 1800))
+    subscriptions = configured_subscriptions()
+    if listener is not None:
+        listener.set_subscriptions(subscriptions)
+    logger.info('Настройки перечитаны.')
+    return subscriptions, poll_interval()
+
+
+def _start_optional(resources, bot, outbox, subscriptions):
+    """.
+    Запускает необязательные компоненты: обработчик команд и запись
+    ответов API. Их остановка регистрируется в `resources`. Возвращает кэш
+    статусов и обработчик команд (`None`, если команды выключены).
+    """
+    cache = listener = None
+    if TELEGRAM_COMMANDS and not SHARDED:
+        from commands import CommandListener, StatusCache
+
+        cache = StatusCache(STATUS_CACHE_TTL, STATUS_CACHE_SIZE)
+        listener = CommandListener(bot, outbox, cache, subscriptions)
+        listener.start()
+        resources.callback(listener.stop)
+    if RECORD_FILE:
+        from replay import Recorder
+
+        recorder = Recorder(RECORD_FILE)
+        api_session.set_recorder(recorder)
+        resources.callback(recorder.close)
+        resources.callback(api_session.set_recorder, None)
+    return cache, listener
+
+
 def main():
     """.
-    При запуске бот запрашивает работы за все время. Последующие запросы
-    отправляются с `timestamp`, равным `date_updated` последней работы.
+    Запускает бота: опрашивает подписки и отправляет уведомления, пока не
+    получит SIGTERM. Возможности и переменные окружения описаны в README.
     """
-    if not check_tokens():
+    if not (SUBSCRIPTIONS_FILE and TELEGRAM_TOKEN or check_tokens()):
         logger.critical(MissingTokenError('Отсутствуют переменные окружения'))
         sys.exit('Отсутствуют переменные окружения')
-    bot = Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = 0
-    previous_report = {}
-    previous_message = ''
-    while True:
-        try:
-            response = get_api_answer(current_timestamp)
-            current_report = check_response(response)[0]
-            if previous_report != current_report:
-                message = parse_status(current_report)
-                logger.info('Изменился статус работы')
-                send_message(bot, message)
-                previous_report = current_report.copy()
-                current_timestamp = get_timestamp(current_report)
-            else:
-                logger.debug('Статус работы не изменился.')
-        except HomeworkServiceError as error:
-            logger.error(error)
-            message = f'Сбой в работе программы: {error}'
-            if message != previous_message:
-                send_message(bot, message)
-                previous_message = message
-        except SendMessageError as error:
-            logger.error(error)
-        finally:
-            time.sleep(RETRY_TIME)
+    if SHARDED and not WORKER_ID:
+        logger.critical(MissingTokenError('Для SHARDED не задан WORKER_ID'))
+        sys.exit('Для SHARDED не задан WORKER_ID')
+
+    import asyncio
+    from contextlib import ExitStack
+    from functools import partial
+
+    import engine
+    import metrics
+    import profiling
+    from circuit_breaker import CircuitBreaker
+    from outbox import LazyBot, Outbox
+    from ratelimit import RequestBudget
+    from storage import MessageJournal, StateStore
+
+    subscriptions = configured_subscriptions()
+    with ExitStack() as resources:
+        shard = None
+        journal_db = STATE_DB
+        if SHARDED:
+            from sharding import ShardCoordinator
+
+            shard = ShardCoordinator(SHARD_DB, WORKER_ID)
+            resources.callback(shard.close)
+            resources.callback(shard.leave)
+            journal_db = f'{STATE_DB}.{shard.worker_id}'
+        journal = MessageJournal(journal_db)
+        resources.callback(journal.close)
+        store = StateStore(STATE_DB)
+        resources.callback(store.close)
+        resources.callback(api_session.close)
+        bot = LazyBot(create_bot)
+        outbox = Outbox(bot, journal=journal)
+        metrics.OUTBOX_SIZE.set_function(lambda: len(outbox))
+        metrics.JOURNAL_SIZE.set_function(lambda: len(journal))
+        profiling.install_signal_handler(PROFILE_CYCLES)
+        if METRICS_PORT:
+            metrics.start_http_server(int(METRICS_PORT), actions={
+                '/profile': lambda params: profiling.profile_action(
+                    params, PROFILE_CYCLES
+                ),
+            })
+        outbox.start()
+        resources.callback(outbox.stop, OUTBOX_FLUSH_TIMEOUT)
+        cache, listener = _start_optional(
+            resources, bot, outbox, subscriptions
+        )
+        budget = None
+        if PRACTICUM_RATE_LIMIT:
+            budget = RequestBudget(PRACTICUM_RATE_LIMIT, PRACTICUM_RATE_BURST)
+        poller = engine.Poller(
+            outbox, POLL_CONCURRENCY, poll_interval(), store,
+            CircuitBreaker(reset_timeout=CIRCUIT_RESET_TIMEOUT), cache, shard,
+            budget=budget,
+            reload=partial(reload_configuration, listener)
+        )
+        asyncio.run(poller.run(subscriptions, handle_signals=True))
 
 
 if __name__ == '__main__':
-    logger.setLevel(logging.DEBUG)
-
-    stream_handler = logging.StreamHandler(stream=sys.stderr)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    stream_handler.setFormatter(formatter)
-
-    logger.addHandler(stream_handler)
+    import logs
 
-    main()
+    log_listener = logs.configure(
+        json_format=LOG_FORMAT == 'json', sample_every=LOG_SAMPLE_EVERY
+    )
+    for logger_name in (__name__, 'engine'):
+        logging.getLogger(logger_name).setLevel(logging.DEBUG)
+    try:
+        main()
+    finally:
+        log_listener.stop()
@@ -0,0 +1,139 @@
+import contextvars
+import json
+import logging
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import metrics
+
+LOG_QUEUE_SIZE = 10000
+DEBUG_SAMPLE_EVERY = 100
+SAMPLING_MAX_KEYS = 1000
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(subscription)s - %(message)s'
+
+current_subscription = contextvars.ContextVar('subscription', default=None)
+
+
+@contextmanager
+def subscription_context(key):
+    """Помечает записи журнала, сделанные внутри блока, ключом подписки."""
+    token = current_subscription.set(key)
+    try:
+        yield
+    finally:
+        current_subscription.reset(token)
+
+
+class SubscriptionFilter(logging.Filter):
+    """Добавляет в запись поле `subscription` - ключ текущей подписки."""
+
+    def filter(self, record):
+        """Дополняет запись и всегда пропускает ее."""
+        if not hasattr(record, 'subscription'):
+            record.subscription = current_subscription.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """.
+    Пропускает только каждую `every`-ю запись уровня `level` и ниже с
+    одинаковым шаблоном сообщения, например повторяющееся в каждом цикле
+    'Статус работы не изменился.'. Записи более высоких уровней проходят
+    всегда. В пропущенную запись добавляется поле `sampled` - сколько
+    похожих записей она представляет. Счетчики хранятся по строке шаблона
+    (для объектов вместо шаблона - по имени класса) и сбрасываются, если
+    шаблонов больше `max_keys`, поэтому их число ограничено.
+    """
+
+    def __init__(self, every=DEBUG_SAMPLE_EVERY, level=logging.DEBUG,
+                 max_keys=SAMPLING_MAX_KEYS):
+        """Задает частоту выборки."""
+        super().__init__()
+        self.every = every
+        self.level = level
+        self.max_keys = max_keys
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        """Решает, попадет ли запись в журнал."""
+        if record.levelno > self.level or self.every <= 1:
+            return True
+        template = record.msg
+        if not isinstance(template, str):
+            template = type(template).__name__
+        key = (record.name, template)
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                self._counts.clear()
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Форматирует запись как одну строку JSON."""
+
+    def format(self, record):
+        """Строка JSON с временем, уровнем, подпиской и сообщением."""
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'subscription': getattr(record, 'subscription', None),
+            'message': record.getMessage(),
+        }
+        sampled = getattr(record, 'sampled', None)
+        if sampled is not None:
+            data['sampled'] = sampled
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """.
+    Обработчик, передающий записи в очередь фонового писателя. Если очередь
+    переполнена, запись отбрасывается и учитывается в метриках, а не
+    блокирует опрос.
+    """
+
+    def enqueue(self, record):
+        """Кладет запись в очередь без ожидания."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+def configure(level=logging.INFO, stream=sys.stderr, json_format=True,
+              sample_every=DEBUG_SAMPLE_EVERY, queue_size=LOG_QUEUE_SIZE):
+    """.
+    Настраивает корневой логгер: записи помечаются ключом подписки,
+    повторяющиеся отладочные записи прореживаются, а запись в `stream`
+    выполняется фоновым потоком. Возвращает запущенный `QueueListener`;
+    его `stop` дописывает оставшиеся записи.
+    """
+    handler = logging.StreamHandler(stream)
+    if json_format:
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(SamplingFilter(sample_every))
+    queue_handler.addFilter(SubscriptionFilter())
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
+    listener = QueueListener(queue_handler.queue, handler)
+    listener.start()
+    return listener
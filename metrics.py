@@ -0,0 +1,366 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    labels = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n')
+        )
+        for name, value in pairs
+    )
+    return f'{{{labels}}}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    """Базовый класс метрики с необязательными метками."""
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        """Создает метрику и регистрирует ее в `registry`."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *labelvalues):
+        """Возвращает дочернюю метрику для значений меток `labelvalues`."""
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(
+                f'Метрика {self.name} ожидает метки {self.labelnames}.'
+            )
+        labelvalues = tuple(str(value) for value in labelvalues)
+        with self._lock:
+            child = self._values.get(labelvalues)
+            if child is None:
+                child = self._values[labelvalues] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def collect(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        for labelvalues, child in self._samples():
+            lines.extend(child.collect(self, labelvalues))
+        return lines
+
+
+class _CounterChild:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        """Увеличивает счетчик на `amount`."""
+        with self._lock:
+            self.value += amount
+
+    def collect(self, metric, labelvalues):
+        labels = _format_labels(metric.labelnames, labelvalues)
+        return [f'{metric.name}{labels} {_format_value(self.value)}']
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик."""
+
+    metric_type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """Увеличивает счетчик без меток на `amount`."""
+        self.labels().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+
+    def __init__(self):
+        super().__init__()
+        self._function = None
+
+    def set(self, value):
+        """Устанавливает значение."""
+        with self._lock:
+            self.value = value
+
+    def set_function(self, function):
+        """Значение будет вычисляться вызовом `function` при каждом сборе."""
+        self._function = function
+
+    def collect(self, metric, labelvalues):
+        if self._function is not None:
+            try:
+                self.value = self._function()
+            except Exception as error:
+                logger.error(f'Не удалось получить {metric.name}: {error}')
+        return super().collect(metric, labelvalues)
+
+
+class Gauge(_Metric):
+    """Текущее значение, которое может как расти, так и уменьшаться."""
+
+    metric_type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        """Устанавливает значение метрики без меток."""
+        self.labels().set(value)
+
+    def set_function(self, function):
+        """Вычисляет значение метрики без меток вызовом `function`."""
+        self.labels().set_function(function)
+
+
+class _HistogramChild:
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Учитывает одно наблюдение `value`."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.buckets):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Контекстный менеджер, измеряющий длительность блока."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def collect(self, metric, labelvalues):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(
+                metric.labelnames, labelvalues, [('le', _format_value(bound))]
+            )
+            lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(
+            metric.labelnames, labelvalues, [('le', '+Inf')]
+        )
+        lines.append(f'{metric.name}_bucket{labels} {count}')
+        labels = _format_labels(metric.labelnames, labelvalues)
+        lines.append(f'{metric.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{metric.name}_count{labels} {count}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Распределение значений (например, задержек) по корзинам."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None,
+                 buckets=DEFAULT_BUCKETS):
+        """Создает гистограмму с верхними границами корзин `buckets`."""
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        """Учитывает наблюдение в гистограмме без меток."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Измеряет длительность блока для гистограммы без меток."""
+        return self.labels().time()
+
+
+class Registry:
+    """Набор метрик, отдаваемых одним эндпоинтом."""
+
+    def __init__(self):
+        """Создает пустой реестр."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Добавляет метрику; имена метрик должны быть уникальны."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Метрика {metric.name} уже существует.')
+            self._metrics[metric.name] = metric
+
+    def exposition(self):
+        """Все метрики реестра в текстовом формате Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = Histogram(
+    'homework_bot_stage_seconds',
+    'Длительность этапов цикла опроса.',
+    ['stage']
+)
+ERRORS = Counter(
+    'homework_bot_errors_total',
+    'Количество исключений по классам.',
+    ['error']
+)
+POLLS = Counter(
+    'homework_bot_polls_total',
+    'Количество опросов по результатам.',
+    ['outcome']
+)
+POLL_LAG = Histogram(
+    'homework_bot_poll_lag_seconds',
+    'Задержка начала опроса относительно запланированного времени.'
+)
+SUBSCRIPTIONS = Gauge(
+    'homework_bot_subscriptions',
+    'Количество опрашиваемых подписок.'
+)
+OUTBOX_SIZE = Gauge(
+    'homework_bot_outbox_size',
+    'Количество сообщений в очереди отправки в Telegram.'
+)
+JOURNAL_SIZE = Gauge(
+    'homework_bot_journal_size',
+    'Количество недоставленных сообщений в журнале.'
+)
+COMMANDS = Counter(
+    'homework_bot_commands_total',
+    'Количество команд пользователей по результату обращения к кэшу.',
+    ['command', 'cache']
+)
+SHARD_WORKERS = Gauge(
+    'homework_bot_shard_workers',
+    'Количество живых процессов, между которыми разделены подписки.'
+)
+BUDGET_DEFERRED = Counter(
+    'homework_bot_budget_deferred_total',
+    'Количество опросов, отложенных из-за исчерпания бюджета запросов.'
+)
+MESSAGES_DROPPED = Counter(
+    'homework_bot_messages_dropped_total',
+    'Количество сообщений, которые бот перестал пытаться доставить.',
+    ['reason']
+)
+LOG_RECORDS_DROPPED = Counter(
+    'homework_bot_log_records_dropped_total',
+    'Количество записей журнала, отброшенных из-за переполнения очереди.'
+)
+
+
+def count_error(error):
+    """Учитывает исключение `error` в счетчике ошибок по классам."""
+    ERRORS.labels(type(error).__name__).inc()
+
+
+def start_http_server(port, addr='127.0.0.1', registry=REGISTRY,
+                      actions=None):
+    """.
+    Запускает в фоновом потоке HTTP-сервер, отдающий метрики реестра по
+    адресу `/metrics`. Словарь `actions` задает служебные действия,
+    доступные по `POST`: путь -> функция, которая получает параметры
+    запроса и возвращает текст ответа. Возвращает объект сервера.
+    """
+    actions = actions or {}
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def send_text(self, status, text, content_type=CONTENT_TYPE):
+            body = text.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            self.send_text(HTTPStatus.OK, registry.exposition())
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            action = actions.get(url.path)
+            if action is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            try:
+                text = action(parse_qs(url.query))
+            except ValueError as error:
+                self.send_text(
+                    HTTPStatus.BAD_REQUEST, f'{error}\n',
+                    'text/plain; charset=utf-8'
+                )
+                return
+            self.send_text(
+                HTTPStatus.ACCEPTED, text, 'text/plain; charset=utf-8'
+            )
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name='metrics-server', daemon=True
+    )
+    thread.start()
+    logger.info(f'Метрики доступны на http://{addr}:{port}/metrics')
+    return server
@@ -0,0 +1,301 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+import metrics
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_CHAT_INTERVAL = 1.0
+REPLAY_BATCH_SIZE = 100
+REPLAY_INTERVAL = 5
+
+
+def is_permanent(error):
+    """.
+    Ошибка Telegram, после которой повтор отправки бесполезен: бот
+    заблокирован пользователем (`Unauthorized`) или запрос отклонен, например
+    потому что чат не найден (`BadRequest`).
+    """
+    try:
+        from telegram.error import BadRequest, Unauthorized
+    except ImportError:
+        return False
+    return isinstance(error, (BadRequest, Unauthorized))
+
+
+class LazyBot:
+    """.
+    Обертка, создающая бота вызовом `factory` при первой отправке или при
+    вызове `prepare`. Позволяет не ждать импорта `telegram` при запуске.
+    """
+
+    def __init__(self, factory):
+        """Запоминает фабрику бота."""
+        self._factory = factory
+        self._bot = None
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """Создает бота, если он еще не создан, и возвращает его."""
+        if self._bot is None:
+            with self._lock:
+                if self._bot is None:
+                    self._bot = self._factory()
+        return self._bot
+
+    def send_message(self, chat_id, text):
+        """Отправляет сообщение через созданного бота."""
+        return self.prepare().send_message(chat_id, text)
+
+    def get_updates(self, **kwargs):
+        """Получает обновления через созданного бота."""
+        return self.prepare().get_updates(**kwargs)
+
+
+class Outbox:
+    """.
+    Очередь исходящих сообщений Telegram с фоновой отправкой. Опрос только
+    ставит сообщения в очередь (`send_message` совместим по сигнатуре с
+    `telegram.Bot`) и не ждет доставки. Отправка соблюдает общий лимит
+    `global_rate` сообщений в секунду и не чаще одного сообщения в
+    `chat_interval` секунд в каждый чат, сохраняя порядок сообщений внутри
+    чата. Ответ 429 с `retry_after` откладывает отправку в этот чат.
+
+    Если передан журнал `journal`, каждое сообщение сохраняется в нем до
+    отправки. Если сообщение не удалось доставить, отправка в этот чат
+    откладывается на паузу, назначенную журналом, и следующие сообщения чата
+    ждут повтора, чтобы не нарушить порядок. Сообщение, которое нельзя
+    доставить в принципе (см. `is_permanent`) или не удалось доставить за
+    `journal.max_attempts` попыток, переносится в таблицу неудач журнала, и
+    очередь чата идет дальше. Сообщения, оставшиеся в журнале от предыдущего
+    запуска, повторяются пачками по `REPLAY_BATCH_SIZE`.
+    """
+
+    def __init__(self, bot, global_rate=TELEGRAM_GLOBAL_RATE,
+                 chat_interval=TELEGRAM_CHAT_INTERVAL, journal=None,
+                 replay_interval=REPLAY_INTERVAL):
+        """.
+        Создает очередь поверх `bot`; отправка начинается после `start`.
+        Сообщения, оставшиеся в журнале от предыдущего запуска, будут
+        отправлены повторно.
+        """
+        self.bot = bot
+        self.chat_interval = chat_interval
+        self.journal = journal
+        self.replay_interval = replay_interval
+        self._next_replay = 0
+        if journal is not None:
+            journal.release_all()
+        self._bucket = TokenBucket(global_rate)
+        self._chats = {}
+        self._ready = []
+        self._sequence = itertools.count()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._aborted = False
+        self._thread = None
+
+    def __len__(self):
+        """Количество сообщений, ожидающих отправки."""
+        return self._size
+
+    def send_message(self, chat_id, text):
+        """Ставит сообщение в очередь чата `chat_id` и сразу возвращается."""
+        message_id = None
+        if self.journal is not None:
+            message_id = self.journal.append(chat_id, text)
+        with self._condition:
+            self._enqueue(chat_id, message_id, text)
+
+    def _enqueue(self, chat_id, message_id, text):
+        messages = self._chats.get(chat_id)
+        if messages is None:
+            messages = self._chats[chat_id] = deque()
+            self._schedule(chat_id, time.monotonic())
+        messages.append((message_id, text))
+        self._size += 1
+        self._condition.notify()
+
+    def _replay(self):
+        """.
+        Возвращает в очередь очередную пачку сообщений из журнала, если
+        очередь не переполнена и подошло время проверки журнала.
+        """
+        now = time.monotonic()
+        if (self.journal is None or now < self._next_replay
+                or self._size >= REPLAY_BATCH_SIZE):
+            return
+        batch = self.journal.claim_due(REPLAY_BATCH_SIZE)
+        for message_id, chat_id, text in batch:
+            self._enqueue(chat_id, message_id, text)
+        if batch:
+            logger.info(f'Повторная отправка сообщений: {len(batch)}.')
+        if len(batch) < REPLAY_BATCH_SIZE:
+            self._next_replay = now + self.replay_interval
+
+    def _schedule(self, chat_id, ready_at):
+        heapq.heappush(
+            self._ready, (ready_at, next(self._sequence), chat_id)
+        )
+
+    def _next_message(self):
+        """.
+        Ждет чат, в который уже можно отправить сообщение, и возвращает его
+        идентификатор и первое сообщение. При остановке и пустой очереди
+        возвращает `None`.
+        """
+        with self._condition:
+            while True:
+                if self._aborted:
+                    return None
+                if not self._stopping:
+                    self._replay()
+                if not self._ready:
+                    if self._stopping:
+                        return None
+                    self._condition.wait(self._replay_timeout())
+                    continue
+                ready_at, _, chat_id = self._ready[0]
+                delay = ready_at - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(
+                        min(delay, self._replay_timeout() or delay)
+                    )
+                    continue
+                heapq.heappop(self._ready)
+                return chat_id, self._chats[chat_id][0]
+
+    def _replay_timeout(self):
+        if self.journal is None or self._stopping:
+            return None
+        return max(self._next_replay - time.monotonic(), 0.01)
+
+    def _complete(self, chat_id, ready_at):
+        """.
+        Убирает отправленное сообщение из очереди чата и планирует следующую
+        отправку в этот чат не раньше `ready_at`.
+        """
+        with self._condition:
+            messages = self._chats[chat_id]
+            messages.popleft()
+            self._size -= 1
+            if messages:
+                self._schedule(chat_id, ready_at)
+            else:
+                del self._chats[chat_id]
+            self._condition.notify_all()
+
+    def _postpone(self, chat_id, ready_at):
+        """.
+        Откладывает отправку в чат до `ready_at`, оставляя недоставленное
+        сообщение первым в очереди чата. При остановке сообщения чата из
+        журнала убираются из очереди: они останутся в журнале и будут
+        отправлены после перезапуска.
+        """
+        with self._condition:
+            if self._stopping and self.journal is not None:
+                self._size -= len(self._chats.pop(chat_id))
+                self._condition.notify_all()
+            else:
+                self._schedule(chat_id, ready_at)
+
+    def _deliver(self, chat_id, message):
+        """.
+        Отправляет одно сообщение. Возвращает момент, раньше которого нельзя
+        писать в чат, и признак того, что сообщение нужно повторить.
+        Доставленное сообщение удаляется из журнала, недоставленное
+        обрабатывает `_fail`.
+        """
+        message_id, text = message
+        self._bucket.acquire()
+        try:
+            with metrics.STAGE_LATENCY.labels('send_message').time():
+                self.bot.send_message(chat_id, text)
+        except Exception as error:
+            metrics.count_error(error)
+            retry_after = getattr(error, 'retry_after', None)
+            if retry_after is not None:
+                logger.warning(
+                    f'Превышен лимит Telegram, повтор через {retry_after} с.'
+                )
+                return time.monotonic() + retry_after, True
+            logger.error(
+                f'Не удалось отправить сообщение в Telegram: {error}'
+            )
+            return self._fail(message_id, error)
+        if message_id is not None:
+            self.journal.remove(message_id)
+        return time.monotonic() + self.chat_interval, False
+
+    def _fail(self, message_id, error):
+        """.
+        Решает судьбу недоставленного сообщения. Сообщение из журнала
+        повторяется после паузы, назначенной журналом, пока не исчерпаны
+        попытки; при постоянной ошибке, исчерпанных попытках или без журнала
+        сообщение отбрасывается. Возвращает то же, что `_deliver`.
+        """
+        reason = 'no_journal'
+        if message_id is not None and is_permanent(error):
+            self.journal.discard(message_id, error)
+            reason = 'permanent'
+        elif message_id is not None:
+            delay = self.journal.record_failure(message_id, error)
+            if delay is not None:
+                return time.monotonic() + delay, True
+            reason = 'attempts'
+        logger.warning(f'Сообщение в Telegram отброшено ({reason}).')
+        metrics.MESSAGES_DROPPED.labels(reason).inc()
+        return time.monotonic() + self.chat_interval, False
+
+    def _run(self):
+        prepare = getattr(self.bot, 'prepare', None)
+        if prepare is not None:
+            try:
+                prepare()
+            except Exception as error:
+                logger.error(f'Не удалось создать telegram-бота: {error}')
+        while True:
+            item = self._next_message()
+            if item is None:
+                return
+            chat_id, message = item
+            ready_at, retry = self._deliver(chat_id, message)
+            if retry:
+                self._postpone(chat_id, ready_at)
+            else:
+                self._complete(chat_id, ready_at)
+
+    def start(self):
+        """Запускает фоновый поток отправки."""
+        self._thread = threading.Thread(
+            target=self._run, name='telegram-outbox', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """.
+        Дожидается отправки накопленных сообщений (не дольше `timeout`
+        секунд) и останавливает фоновый поток. Сообщения, которые не успели
+        отправить, остаются в журнале и будут отправлены после перезапуска.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is None:
+            return
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(
+                f'Не отправлено сообщений при остановке: {self._size}.'
+            )
+            with self._condition:
+                self._aborted = True
+                self._condition.notify_all()
+            self._thread.join()
@@ -0,0 +1,165 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CYCLES = 100
+PROFILE_TOP = 40
+STAGES = ('get_api_answer', 'check_response', 'parse_status', 'send_message')
+
+
+def _stage_totals():
+    """Число и суммарная длительность этапов опроса по метрикам."""
+    totals = {}
+    for stage in STAGES:
+        child = metrics.STAGE_LATENCY.labels(stage)
+        totals[stage] = (child.count, child.sum)
+    return totals
+
+
+def _check_cycles(cycles):
+    if cycles < 1:
+        raise ValueError(
+            f'Число циклов профилирования должно быть положительным: {cycles}'
+        )
+
+
+class Profiler:
+    """.
+    Профилировщик по запросу. После `request(cycles)` следующие `cycles`
+    циклов опроса выполняются под `cProfile`; профили объединяются и
+    сохраняются в каталог `directory` в формате `pstats` вместе с текстовой
+    сводкой: самые затратные функции и длительность этапов опроса
+    (`get_api_answer`, `check_response`, `parse_status`, `send_message`) за
+    время профилирования. Одновременно профилируется не больше одного цикла:
+    циклы других потоков в это время выполняются как обычно. Пока
+    профилирование не запрошено, `cycle` стоит одной проверки атрибута.
+    """
+
+    def __init__(self, directory='.'):
+        """Создает выключенный профилировщик."""
+        self.directory = directory
+        self._remaining = 0
+        self._busy = threading.Lock()
+        self._stats = None
+        self._stages = None
+        self._started = None
+
+    @property
+    def active(self):
+        """Запрошено ли профилирование."""
+        return self._remaining > 0
+
+    def request(self, cycles=PROFILE_CYCLES):
+        """.
+        Запрашивает профилирование следующих `cycles` циклов. Безопасно
+        вызывать из обработчика сигнала. Если `cycles` меньше единицы,
+        выбрасывает `ValueError`.
+        """
+        _check_cycles(cycles)
+        if not self.active:
+            self._remaining = cycles
+            logger.info(f'Профилирование следующих {cycles} циклов опроса.')
+
+    @contextmanager
+    def cycle(self):
+        """Оборачивает один цикл опроса."""
+        if not self._remaining or not self._busy.acquire(blocking=False):
+            yield
+            return
+        try:
+            if not self._remaining:
+                yield
+                return
+            if self._stats is None:
+                self._stages = _stage_totals()
+                self._started = time.time()
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                self._collect(profile)
+        finally:
+            self._busy.release()
+
+    def _collect(self, profile):
+        if self._stats is None:
+            self._stats = pstats.Stats(profile)
+        else:
+            self._stats.add(profile)
+        self._remaining -= 1
+        if not self._remaining:
+            self._dump()
+
+    def _dump(self):
+        stats, self._stats = self._stats, None
+        name = time.strftime(
+            'profile-%Y%m%d-%H%M%S', time.localtime(self._started)
+        )
+        path = os.path.join(self.directory, name)
+        try:
+            stats.dump_stats(f'{path}.pstats')
+            with open(f'{path}.txt', 'w', encoding='utf-8') as file:
+                file.write(self.summary(stats))
+        except OSError as error:
+            logger.error(f'Не удалось сохранить профиль: {error}')
+            return
+        logger.info(f'Профиль сохранен: {path}.pstats')
+
+    def summary(self, stats):
+        """Текстовая сводка профиля и длительности этапов опроса."""
+        lines = ['Этапы опроса за время профилирования:']
+        now = _stage_totals()
+        for stage in STAGES:
+            count = now[stage][0] - self._stages[stage][0]
+            total = now[stage][1] - self._stages[stage][1]
+            mean = total / count if count else 0
+            lines.append(
+                f'{stage:16} вызовов {count:6}  всего {total:9.3f} с  '
+                f'среднее {mean * 1000:8.2f} мс'
+            )
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        lines.append('')
+        lines.append(output.getvalue())
+        return '\n'.join(lines)
+
+
+PROFILER = Profiler(os.getenv('PROFILE_DIR', '.'))
+
+
+def install_signal_handler(cycles=PROFILE_CYCLES, profiler=PROFILER):
+    """.
+    Включает профилирование `cycles` циклов по сигналу `SIGUSR1`:
+    `kill -USR1 <pid>`. На платформах без этого сигнала ничего не делает.
+    Некорректное `cycles` отклоняется сразу, а не в обработчике сигнала.
+    """
+    _check_cycles(cycles)
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    signal.signal(
+        signal.SIGUSR1, lambda signum, frame: profiler.request(cycles)
+    )
+
+
+def profile_action(params, cycles=PROFILE_CYCLES, profiler=PROFILER):
+    """.
+    Действие HTTP-эндпоинта `POST /profile?cycles=N`: запрашивает
+    профилирование и возвращает текст ответа. Нечисловое или меньшее
+    единицы `cycles` выбрасывает `ValueError` (ответ 400).
+    """
+    cycles = int(params.get('cycles', [cycles])[0])
+    profiler.request(cycles)
+    return f'Профилирование следующих {cycles} циклов опроса.\n'
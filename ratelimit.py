@@ -0,0 +1,76 @@
+import threading
+import time
+
+RESERVE_SHARE = 0.25
+
+
+class TokenBucket:
+    """.
+    Потокобезопасное ведро токенов: пополняется со скоростью `rate` токенов в
+    секунду и вмещает не более `capacity` токенов (по умолчанию - `rate`).
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """Создает заполненное ведро."""
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def try_acquire(self, tokens=1, reserve=0):
+        """.
+        Пытается забрать `tokens` токенов, оставив в ведре не меньше `reserve`.
+        Возвращает 0, если токены получены, иначе - сколько секунд нужно
+        подождать до их появления.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens - reserve >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens + reserve - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Блокирует поток, пока не удастся забрать `tokens` токенов."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class RequestBudget:
+    """.
+    Общий бюджет запросов к API Практикум.Домашки для всех подписок процесса:
+    в среднем не больше `rate` запросов в секунду и не больше `burst` подряд
+    (по умолчанию - `rate`, но не меньше одного запроса). Сверх этого в ведре
+    хранится резерв `reserve` токенов, доступный только приоритетным
+    запросам. Когда бюджет на исходе, обычные запросы откладываются, а
+    приоритетные выполняются за счет резерва.
+    """
+
+    def __init__(self, rate, burst=None, reserve=None, clock=time.monotonic):
+        """Создает заполненный бюджет."""
+        burst = burst or max(rate, 1)
+        self.reserve = (
+            reserve if reserve is not None else max(1, burst * RESERVE_SHARE)
+        )
+        self._bucket = TokenBucket(rate, burst + self.reserve, clock)
+
+    def try_acquire(self, priority=False):
+        """.
+        Пытается получить разрешение на один запрос. Возвращает 0, если оно
+        получено, иначе - сколько секунд нужно подождать.
+        """
+        return self._bucket.try_acquire(
+            reserve=0 if priority else self.reserve
+        )
@@ -0,0 +1,98 @@
+from exceptions import InvalidHomeworkError
+from homework import TELEGRAM_MESSAGES, get_timestamp
+
+STATUSES = {status: status for status in TELEGRAM_MESSAGES}
+FIELDS = {
+    'homework_name': 'name',
+    'status': 'status',
+    'updated_at': 'updated_at',
+}
+
+
+def homework_key(homework):
+    """.
+    Ключ работы в индексе: `id`, а при его отсутствии - `homework_name`.
+    Приводится к строке, чтобы индекс одинаково выглядел до и после
+    сохранения в JSON.
+    """
+    key = homework.get('id')
+    if key is None:
+        key = homework.get('homework_name')
+    return str(key)
+
+
+class HomeworkRecord:
+    """.
+    Компактная запись о работе из ответа API: ключ, название, статус и
+    время обновления в формате Unix time. Создается один раз при проверке
+    ответа вместо хранения и повторного разбора исходного словаря.
+    Известные статусы хранятся как общие строки-константы, поэтому
+    записи и индексы статусов не держат собственных копий.
+    """
+
+    __slots__ = ('key', 'name', 'status', 'updated_at')
+
+    def __init__(self, key, name, status, updated_at=0):
+        """Создает запись из готовых полей."""
+        self.key = key
+        self.name = name
+        self.status = STATUSES.get(status, status)
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_api(cls, homework):
+        """.
+        Запись из словаря работы в ответе API. Уже созданная запись
+        возвращается без изменений. Если работа не словарь или время ее
+        обновления не разбирается, вызывает `InvalidHomeworkError`.
+        """
+        if isinstance(homework, cls):
+            return homework
+        if not isinstance(homework, dict):
+            raise InvalidHomeworkError(
+                f'Работа в ответе сервиса не является словарем: {homework!r}.'
+            )
+        updated_at = 0
+        if homework.get('date_updated'):
+            try:
+                updated_at = get_timestamp(homework)
+            except (TypeError, ValueError):
+                raise InvalidHomeworkError(
+                    'Некорректное время обновления работы: '
+                    f'{homework["date_updated"]!r}.'
+                )
+        return cls(
+            homework_key(homework),
+            homework.get('homework_name'),
+            homework.get('status'),
+            updated_at,
+        )
+
+    def get(self, field, default=None):
+        """.
+        Значение поля по имени из ответа API (`homework_name`, `status`):
+        позволяет передавать запись в `parse_status`.
+        """
+        attribute = FIELDS.get(field)
+        if attribute is None:
+            return default
+        value = getattr(self, attribute)
+        return default if value is None else value
+
+    def __eq__(self, other):
+        """Записи равны, если совпадают все поля."""
+        if not isinstance(other, HomeworkRecord):
+            return NotImplemented
+        return (
+            (self.key, self.name, self.status, self.updated_at)
+            == (other.key, other.name, other.status, other.updated_at)
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Представление записи для логов и отладки."""
+        return (
+            f'HomeworkRecord(key={self.key!r}, name={self.name!r}, '
+            f'status={self.status!r}, updated_at={self.updated_at!r})'
+        )
@@ -0,0 +1,218 @@
+"""Запись и воспроизведение ответов API Практикум.Домашки.
+
+Запись включается переменной окружения `RECORD_FILE`: каждый ответ
+сервиса (время, хеш токена, `from_date`, код ответа и тело) добавляется
+строкой JSON в конец файла; файл с расширением `.gz` сжимается.
+Воспроизведение прогоняет записанные ответы через тот же путь, что и
+опрос: проверку кода ответа, `check_response`, поиск изменений,
+`parse_status` и отправку - без сети:
+
+    python replay.py traffic.jsonl.gz --speed 1
+
+Без `--speed` ответы воспроизводятся с максимальной скоростью.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+
+import api_session
+from scheduler import FAILED
+
+logger = logging.getLogger(__name__)
+
+INVALID = 'invalid'
+
+
+def _open(path, mode):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def token_hash(headers):
+    """Хеш токена из заголовка `Authorization`, не раскрывающий токен."""
+    authorization = (headers or {}).get('Authorization', '')
+    return hashlib.sha256(
+        authorization.split(' ', 1)[-1].encode()
+    ).hexdigest()[:16]
+
+
+class Recorder:
+    """.
+    Дописывает ответы API в файл `path`. Подключается к общему HTTP-клиенту
+    через `api_session.set_recorder`. Сбой запроса записывается с кодом
+    `null` и текстом ошибки вместо тела.
+    """
+
+    def __init__(self, path):
+        """Открывает файл записи на дозапись."""
+        self._file = _open(path, 'a')
+        self._lock = threading.Lock()
+
+    def record(self, headers, params, status, body):
+        """Записывает один ответ."""
+        line = json.dumps({
+            't': round(time.time(), 3),
+            'token': token_hash(headers),
+            'from_date': (params or {}).get('from_date'),
+            'status': status,
+            'body': body,
+        }, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def call(self, func, url, **kwargs):
+        """.
+        Выполняет запрос `func(url, **kwargs)` и записывает его результат.
+        Тело потокового ответа при записи читается целиком.
+        """
+        headers, params = kwargs.get('headers'), kwargs.get('params')
+        try:
+            response = func(url, **kwargs)
+            api_session.read(response)
+        except api_session.request_exceptions() as error:
+            self.record(headers, params, None, str(error))
+            raise
+        self.record(headers, params, response.status_code, response.text)
+        return response
+
+    def close(self):
+        """Закрывает файл записи."""
+        with self._lock:
+            self._file.close()
+
+
+def read_records(path):
+    """Записанные ответы в порядке записи."""
+    with _open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplayResponse:
+    """Ответ, восстановленный из записи: минимальный интерфейс `requests`."""
+
+    def __init__(self, status, body):
+        """Создает ответ с кодом `status` и телом `body`."""
+        self.status_code = status
+        self.text = body
+        self.content = body.encode('utf-8')
+
+    def json(self):
+        """Тело ответа, приведенное к типам Python."""
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        """Тело ответа частями по `chunk_size` байт."""
+        stream = io.BytesIO(self.content)
+        return iter(lambda: stream.read(chunk_size), b'')
+
+    def close(self):
+        """Ничего не освобождает: соединения нет."""
+
+
+class ReplaySession:
+    """.
+    Подменяет HTTP-клиент: на каждый запрос отдает ответ из `record`,
+    который задает драйвер воспроизведения перед опросом.
+    """
+
+    def __init__(self):
+        """Создает клиент без текущей записи."""
+        self.record = None
+
+    def get(self, url, **kwargs):
+        """Ответ из текущей записи или сбой запроса, если он был записан."""
+        if self.record['status'] is None:
+            import requests
+
+            raise requests.exceptions.ConnectionError(self.record['body'])
+        return ReplayResponse(self.record['status'], self.record['body'])
+
+    def close(self):
+        """Ничего не освобождает: соединений нет."""
+
+
+class NullBot:
+    """Бот, который только считает сообщения."""
+
+    def __init__(self):
+        """Создает бота с пустыми счетчиками."""
+        self.sent = 0
+
+    def send_message(self, chat_id, text):
+        """Учитывает сообщение без отправки."""
+        self.sent += 1
+
+
+def replay(records, bot, speed=None, sleep=time.sleep):
+    """.
+    Воспроизводит записи `records`, опрашивая по каждой подписку с тем же
+    хешем токена. При заданной `speed` паузы между ответами повторяют
+    записанные, ускоренные в `speed` раз. Записанные ответы с кодом 200,
+    которые не проходят проверку ответа или работ в нем, учитываются как
+    `invalid` и не прерывают воспроизведение. Возвращает счетчики
+    результатов опросов.
+    """
+    import engine
+
+    subscriptions = {}
+    session = ReplaySession()
+    outcomes = Counter()
+    previous_time = None
+    api_session.set_session(session)
+    try:
+        for record in records:
+            if speed and previous_time is not None:
+                sleep(max(record['t'] - previous_time, 0) / speed)
+            previous_time = record['t']
+            subscription = subscriptions.get(record['token'])
+            if subscription is None:
+                subscription = subscriptions[record['token']] = (
+                    engine.Subscription(record['token'], record['token'])
+                )
+            session.record = record
+            try:
+                outcome = engine.poll_subscription(subscription, bot)
+            except (KeyError, TypeError, ValueError) as error:
+                logger.warning(f'Некорректный записанный ответ: {error}')
+                outcome = INVALID
+            if outcome == FAILED and record['status'] == HTTPStatus.OK:
+                outcome = INVALID
+            outcomes[outcome] += 1
+    finally:
+        api_session.close()
+    return outcomes
+
+
+def main(args=None):
+    """Точка входа воспроизведения."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='файл записи')
+    parser.add_argument('--speed', type=float,
+                        help='ускорение относительно записанного темпа')
+    args = parser.parse_args(args)
+    logging.basicConfig(level=logging.WARNING)
+    bot = NullBot()
+    started = time.perf_counter()
+    outcomes = replay(read_records(args.path), bot, args.speed)
+    elapsed = time.perf_counter() - started
+    total = sum(outcomes.values())
+    report = dict(outcomes, responses=total, messages=bot.sent,
+                  elapsed_s=round(elapsed, 3),
+                  responses_per_s=round(total / elapsed, 1) if elapsed else 0)
+    for key, value in report.items():
+        print(f'{key:20} {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import random
+
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+
+class AdaptiveInterval:
+    """.
+    Адаптивный интервал опроса. Пока работа на проверке или статус только что
+    изменился, опрос идет с минимальным интервалом `floor`. Если ничего не
+    меняется или сервис отвечает ошибкой, интервал растет в `factor` раз
+    (со случайным уменьшением до доли `jitter`) до `ceiling`.
+    """
+
+    def __init__(self, floor, ceiling, initial=None, factor=2.0, jitter=0.1):
+        """Задает границы интервала и параметры экспоненциального роста."""
+        if not 0 < floor <= ceiling:
+            raise ValueError('Должно выполняться 0 < floor <= ceiling.')
+        self.floor = floor
+        self.ceiling = ceiling
+        self.initial = self._clamp(initial if initial is not None else floor)
+        self.factor = factor
+        self.jitter = jitter
+
+    def _clamp(self, delay):
+        return min(max(delay, self.floor), self.ceiling)
+
+    def next_delay(self, previous_delay, outcome, reviewing=False):
+        """.
+        Возвращает паузу перед следующим опросом по предыдущей паузе,
+        результату опроса (`CHANGED`, `UNCHANGED`, `FAILED`) и признаку того,
+        что работа находится на проверке.
+        """
+        if outcome != FAILED and (reviewing or outcome == CHANGED):
+            return self.floor
+        delay = min(self._clamp(previous_delay) * self.factor, self.ceiling)
+        delay *= random.uniform(1 - self.jitter, 1)
+        return max(delay, self.floor)
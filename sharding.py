@@ -0,0 +1,192 @@
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RING_REPLICAS = 100
+HEARTBEAT_INTERVAL = 15
+HEARTBEAT_TTL = 60
+LEASE_TTL = 300
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.md5(str(value).encode()).digest()[:8], 'big'
+    )
+
+
+def default_worker_id():
+    """Идентификатор процесса по умолчанию: имя хоста и PID."""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class HashRing:
+    """.
+    Кольцо согласованного хеширования. Каждый узел занимает на кольце
+    `replicas` точек, поэтому ключи распределяются между узлами равномерно,
+    а при добавлении или удалении узла переезжает только его доля ключей.
+    """
+
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        """Строит кольцо из узлов `nodes`."""
+        self.replicas = replicas
+        self.nodes = frozenset(nodes)
+        points = sorted(
+            (_hash(f'{node}#{replica}'), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key):
+        """Узел, которому принадлежит ключ `key`, или `None` без узлов."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ShardCoordinator:
+    """.
+    Распределяет подписки между процессами (на одном или нескольких хостах)
+    через общий файл SQLite. Каждый процесс регулярно отмечается в таблице
+    процессов; подписки делятся между живыми процессами согласованным
+    хешированием и перераспределяются, когда процесс появляется или
+    пропадает дольше чем на `heartbeat_ttl` секунд. Перед опросом процесс
+    берет аренду подписки на `lease_ttl` секунд, поэтому даже при
+    рассогласованных представлениях о кольце одну подписку не опрашивают
+    два процесса сразу.
+    """
+
+    def __init__(self, path, worker_id=None, heartbeat_ttl=HEARTBEAT_TTL,
+                 lease_ttl=LEASE_TTL, clock=time.time):
+        """Открывает (и при необходимости создает) таблицы в файле `path`."""
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_ttl = heartbeat_ttl
+        self.lease_ttl = lease_ttl
+        self._clock = clock
+        self._ring = HashRing([self.worker_id])
+        self._held = set()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False
+        )
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS shard_workers ('
+                'worker_id TEXT PRIMARY KEY, '
+                'heartbeat_at REAL NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS shard_leases ('
+                'key TEXT PRIMARY KEY, '
+                'worker_id TEXT NOT NULL, '
+                'expires_at REAL NOT NULL)'
+            )
+
+    @property
+    def workers(self):
+        """Живые процессы по последней отметке."""
+        return self._ring.nodes
+
+    def owns(self, key):
+        """Принадлежит ли подписка с ключом `key` этому процессу."""
+        return self._ring.owner(key) == self.worker_id
+
+    def holds(self, key):
+        """Держит ли процесс аренду подписки `key`."""
+        return key in self._held
+
+    def heartbeat(self):
+        """.
+        Отмечает процесс живым, удаляет давно не отмечавшиеся процессы и
+        перестраивает кольцо. Аренды подписок, которые перешли к другим
+        процессам, освобождаются сразу, чтобы новый владелец не ждал их
+        истечения.
+        """
+        now = self._clock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO shard_workers (worker_id, '
+                'heartbeat_at) VALUES (?, ?)',
+                (self.worker_id, now)
+            )
+            self._connection.execute(
+                'DELETE FROM shard_workers WHERE heartbeat_at < ?',
+                (now - self.heartbeat_ttl,)
+            )
+            workers = [
+                worker_id for worker_id, in self._connection.execute(
+                    'SELECT worker_id FROM shard_workers'
+                )
+            ]
+            if set(workers) != self._ring.nodes:
+                logger.info(
+                    f'Подписки перераспределены между процессами: '
+                    f'{len(workers)}.'
+                )
+                self._ring = HashRing(workers, self._ring.replicas)
+            released = [key for key in self._held if not self.owns(key)]
+            self._connection.executemany(
+                'DELETE FROM shard_leases WHERE key = ? AND worker_id = ?',
+                [(key, self.worker_id) for key in released]
+            )
+            self._held.difference_update(released)
+        metrics.SHARD_WORKERS.set(len(workers))
+
+    def acquire(self, key):
+        """.
+        Берет или продлевает аренду подписки `key`. Возвращает `False`, если
+        подписка принадлежит другому процессу или ее аренда еще не истекла.
+        """
+        if not self.owns(key):
+            return False
+        now = self._clock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT INTO shard_leases (key, worker_id, expires_at) '
+                'VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE SET '
+                'worker_id = excluded.worker_id, '
+                'expires_at = excluded.expires_at '
+                'WHERE shard_leases.worker_id = excluded.worker_id '
+                'OR shard_leases.expires_at < ?',
+                (key, self.worker_id, now + self.lease_ttl, now)
+            )
+            owner, = self._connection.execute(
+                'SELECT worker_id FROM shard_leases WHERE key = ?', (key,)
+            ).fetchone()
+            if owner != self.worker_id:
+                self._held.discard(key)
+                return False
+            self._held.add(key)
+            return True
+
+    def leave(self):
+        """.
+        Удаляет процесс из таблицы и освобождает его аренды, чтобы
+        подписки сразу перешли к оставшимся процессам.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM shard_workers WHERE worker_id = ?',
+                (self.worker_id,)
+            )
+            self._connection.execute(
+                'DELETE FROM shard_leases WHERE worker_id = ?',
+                (self.worker_id,)
+            )
+            self._held.clear()
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,262 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from diff import HomeworkIndex
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 10
+
+
+class StateStore:
+    """.
+    Хранилище состояния опроса подписок в SQLite: временная метка, индекс
+    статусов работ, открытое окно сводки ошибок и расписание опроса.
+    Позволяет после перезапуска продолжить опрос с места остановки.
+    """
+
+    SCHEDULE_COLUMNS = ('poll_delay', 'next_poll_at')
+
+    def __init__(self, path):
+        """Открывает (и при необходимости создает) файл базы `path`."""
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS subscription_state ('
+                'key TEXT PRIMARY KEY, '
+                'from_date INTEGER NOT NULL, '
+                'homeworks TEXT NOT NULL, '
+                'errors TEXT NOT NULL, '
+                'updated_at REAL NOT NULL, '
+                'poll_delay REAL, '
+                'next_poll_at REAL)'
+            )
+            columns = {
+                row[1] for row in self._connection.execute(
+                    'PRAGMA table_info(subscription_state)'
+                )
+            }
+            if 'previous_message' in columns:
+                self._connection.execute(
+                    'ALTER TABLE subscription_state '
+                    'RENAME COLUMN previous_message TO errors'
+                )
+                self._connection.execute(
+                    "UPDATE subscription_state SET errors = '{}'"
+                )
+            for column in self.SCHEDULE_COLUMNS:
+                if column not in columns:
+                    self._connection.execute(
+                        'ALTER TABLE subscription_state '
+                        f'ADD COLUMN {column} REAL'
+                    )
+
+    def load(self, subscription):
+        """.
+        Восстанавливает состояние подписки из базы. Возвращает `True`, если
+        сохраненное состояние найдено.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT from_date, homeworks, errors, poll_delay, '
+                'next_poll_at FROM subscription_state WHERE key = ?',
+                (subscription.key,)
+            ).fetchone()
+        if row is None:
+            return False
+        current_timestamp, homeworks, errors, poll_delay, next_poll_at = row
+        subscription.current_timestamp = current_timestamp
+        subscription.homeworks = HomeworkIndex(json.loads(homeworks))
+        subscription.errors.restore(json.loads(errors))
+        if poll_delay is not None:
+            subscription.poll_delay = poll_delay
+            subscription.next_poll_at = next_poll_at
+        return True
+
+    @staticmethod
+    def _row(subscription):
+        return (
+            subscription.key,
+            subscription.current_timestamp,
+            json.dumps(subscription.homeworks.to_dict()),
+            json.dumps(subscription.errors.to_dict()),
+            time.time(),
+            subscription.poll_delay,
+            subscription.next_poll_at,
+        )
+
+    def save(self, subscription):
+        """Атомарно сохраняет текущее состояние подписки."""
+        self.save_many([subscription])
+
+    def save_many(self, subscriptions):
+        """Сохраняет состояние нескольких подписок одной транзакцией."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO subscription_state '
+                '(key, from_date, homeworks, errors, '
+                'updated_at, poll_delay, next_poll_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [self._row(subscription) for subscription in subscriptions]
+            )
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
+
+
+class MessageJournal:
+    """.
+    Журнал недоставленных сообщений Telegram в SQLite. Сообщение попадает в
+    журнал до отправки и удаляется после доставки, поэтому ни сбой Telegram,
+    ни перезапуск бота не теряют уведомления. Неудачные отправки повторяются
+    с экспоненциально растущей паузой, но не больше `max_attempts` раз.
+    Сообщения, которые так и не удалось доставить, переносятся в таблицу
+    `failed_messages` вместе с последней ошибкой.
+    """
+
+    def __init__(self, path, retry_base=30, retry_ceiling=3600,
+                 max_attempts=MAX_SEND_ATTEMPTS):
+        """Открывает (и при необходимости создает) журнал в файле `path`."""
+        self.retry_base = retry_base
+        self.retry_ceiling = retry_ceiling
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS pending_messages ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'chat_id TEXT NOT NULL, '
+                'text TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL DEFAULT 0, '
+                'next_attempt REAL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS failed_messages ('
+                'id INTEGER PRIMARY KEY, '
+                'chat_id TEXT NOT NULL, '
+                'text TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL, '
+                'error TEXT, '
+                'failed_at REAL NOT NULL)'
+            )
+
+    def __len__(self):
+        """Количество недоставленных сообщений."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM pending_messages'
+            ).fetchone()[0]
+
+    def append(self, chat_id, text):
+        """.
+        Записывает сообщение, уже поставленное в очередь отправки, и
+        возвращает его идентификатор в журнале.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO pending_messages (chat_id, text) VALUES (?, ?)',
+                (json.dumps(chat_id), text)
+            )
+        return cursor.lastrowid
+
+    def remove(self, message_id):
+        """Удаляет доставленное сообщение."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM pending_messages WHERE id = ?', (message_id,)
+            )
+
+    def _count_attempt(self, message_id):
+        attempts, = self._connection.execute(
+            'SELECT attempts FROM pending_messages WHERE id = ?',
+            (message_id,)
+        ).fetchone()
+        self._connection.execute(
+            'UPDATE pending_messages SET attempts = ? WHERE id = ?',
+            (attempts + 1, message_id)
+        )
+        return attempts + 1
+
+    def _delay(self, attempts):
+        return min(self.retry_base * 2 ** (attempts - 1), self.retry_ceiling)
+
+    def record_failure(self, message_id, error):
+        """.
+        Учитывает неудачную отправку сообщения, которое остается в очереди
+        отправки, и возвращает экспоненциальную паузу до следующей попытки.
+        Повторно из журнала такое сообщение не выдается. Если попытки
+        исчерпаны, сообщение переносится в `failed_messages` с ошибкой
+        `error` и возвращается `None`.
+        """
+        with self._lock, self._connection:
+            attempts = self._count_attempt(message_id)
+            if attempts < self.max_attempts:
+                return self._delay(attempts)
+            self._move_to_failed(message_id, error)
+        return None
+
+    def discard(self, message_id, error):
+        """.
+        Переносит в `failed_messages` сообщение, доставить которое нельзя,
+        например потому что пользователь заблокировал бота.
+        """
+        with self._lock, self._connection:
+            self._move_to_failed(message_id, error)
+
+    def _move_to_failed(self, message_id, error):
+        self._connection.execute(
+            'INSERT INTO failed_messages '
+            '(id, chat_id, text, attempts, error, failed_at) '
+            'SELECT id, chat_id, text, attempts, ?, ? '
+            'FROM pending_messages WHERE id = ?',
+            (str(error), time.time(), message_id)
+        )
+        self._connection.execute(
+            'DELETE FROM pending_messages WHERE id = ?', (message_id,)
+        )
+
+    def release_all(self):
+        """.
+        Делает доступными для повтора все сообщения, в том числе оставшиеся
+        в очереди отправки предыдущего процесса.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE pending_messages SET next_attempt = 0 '
+                'WHERE next_attempt IS NULL'
+            )
+
+    def claim_due(self, limit):
+        """.
+        Забирает для повторной отправки не более `limit` сообщений, время
+        повтора которых наступило. Возвращает список кортежей
+        `(id, chat_id, text)` в порядке добавления.
+        """
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                'SELECT id, chat_id, text FROM pending_messages '
+                'WHERE next_attempt IS NOT NULL AND next_attempt <= ? '
+                'ORDER BY id LIMIT ?',
+                (time.time(), limit)
+            ).fetchall()
+            self._connection.executemany(
+                'UPDATE pending_messages SET next_attempt = NULL '
+                'WHERE id = ?',
+                [(message_id,) for message_id, _, _ in rows]
+            )
+        return [
+            (message_id, json.loads(chat_id), text)
+            for message_id, chat_id, text in rows
+        ]
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
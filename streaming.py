@@ -0,0 +1,167 @@
+import codecs
+import json
+
+import api_session
+from exceptions import RequestError
+from homework import request_homework_statuses
+
+CHUNK_SIZE = 16 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+class HomeworkStream:
+    """.
+    Потоковый разбор ответа API Практикум.Домашки. Работы из списка
+    `homeworks` выдаются по одной по мере чтения ответа, поэтому в памяти
+    одновременно находятся только текущая работа и небольшой буфер, каков
+    бы ни был размер истории. Проверки повторяют `check_response`: ответ
+    должен быть словарем, содержать `current_date` и список `homeworks`.
+    Значение `current_date` доступно после того, как поток прочитан.
+    """
+
+    def __init__(self, chunks, close=None):
+        """.
+        Создает разбор поверх итератора байтовых или строковых частей.
+        Функция `close` вызывается, когда разбор завершен или прерван.
+        """
+        self._chunks = iter(chunks)
+        self._close = close
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._position = 0
+        self._exhausted = False
+        self._consumed = False
+        self.current_date = None
+
+    def _read(self):
+        """.
+        Дочитывает следующую часть ответа. При конце ответа - `False`.
+        Если истек срок опроса (`api_session.deadline`), чтение прерывается.
+        """
+        if self._exhausted:
+            return False
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+        api_session.remaining()
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._exhausted = True
+            self._buffer += self._utf8.decode(b'', final=True)
+            return False
+        except api_session.request_exceptions() as error:
+            raise RequestError(
+                f'Сбой при чтении ответа сервиса Практикум.Домашка: {error}.'
+            )
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        self._buffer += chunk
+        return True
+
+    def _peek(self):
+        """Первый непробельный символ без его чтения или `''` в конце."""
+        while True:
+            while (self._position < len(self._buffer)
+                   and self._buffer[self._position] in WHITESPACE):
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read():
+                return ''
+
+    def _expect(self, characters):
+        character = self._peek()
+        if not character or character not in characters:
+            raise ValueError(
+                f'Некорректный JSON в ответе сервиса: ожидался один из '
+                f'символов {characters!r}, получено {character!r}.'
+            )
+        self._position += 1
+        return character
+
+    def _value(self):
+        """.
+        Читает одно JSON-значение целиком. Значение считается полным, только
+        если за ним в буфере есть еще символ: иначе число в конце буфера
+        могло быть обрезано.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(
+                    self._buffer, self._position
+                )
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            if end < len(self._buffer) or not self._read():
+                self._position = end
+                return value
+
+    def _homeworks(self):
+        if self._peek() != '[':
+            value = self._value()
+            raise TypeError(
+                f'Значение по ключу `homeworks` не является списком.'
+                f'Ответ сервиса: {value}'
+            )
+        self._position += 1
+        if self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def __iter__(self):
+        """Выдает работы из ответа по одной."""
+        if self._consumed:
+            raise RuntimeError('Ответ сервиса уже прочитан.')
+        self._consumed = True
+        try:
+            yield from self._parse()
+        finally:
+            if self._close is not None:
+                self._close()
+
+    def _parse(self):
+        if self._peek() != '{':
+            raise TypeError('Ответ сервиса не является словарем.')
+        self._position += 1
+        has_homeworks = False
+        if self._peek() == '}':
+            self._position += 1
+        else:
+            while True:
+                key = self._value()
+                self._expect(':')
+                if key == 'homeworks':
+                    has_homeworks = True
+                    yield from self._homeworks()
+                else:
+                    value = self._value()
+                    if key == 'current_date':
+                        self.current_date = value
+                if self._expect(',}') == '}':
+                    break
+        if not self.current_date:
+            raise KeyError(
+                'В полученном ответе отсутствует ключ `current_date`.'
+            )
+        if not has_homeworks:
+            raise KeyError('В полученном ответе отсутствует ключ `homeworks`.')
+
+
+def stream_homework_statuses(token, current_timestamp):
+    """.
+    Запрос к `API Yandex Practicum`, ответ которого разбирается потоково.
+    Подходит для первого запроса (`from_date=0`), когда возвращается вся
+    история работ.
+    """
+    response = request_homework_statuses(token, current_timestamp, stream=True)
+    return HomeworkStream(
+        api_session.iter_content(response, CHUNK_SIZE), response.close
+    )
@@ -0,0 +1,199 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+import api_session
+import homework
+from exceptions import DeadlineExceededError, RequestError
+from streaming import stream_homework_statuses
+
+
+def drip_server(stop):
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=drip, args=(connection,), daemon=True
+            ).start()
+
+    def drip(connection):
+        with connection:
+            connection.recv(65536)
+            connection.sendall(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: 1000\r\n\r\n'
+            )
+            while not stop.wait(0.1):
+                try:
+                    connection.sendall(b' ')
+                except OSError:
+                    return
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+class TestApiSession:
+
+    def test_session_is_shared(self):
+        api_session.configure(pool_size=5, http2=False)
+        try:
+            session = api_session.get_session()
+            assert session is api_session.get_session(), (
+                'Проверьте, что все запросы используют одну сессию'
+            )
+            assert isinstance(session, requests.Session)
+            adapter = session.get_adapter('https://practicum.yandex.ru')
+            assert adapter._pool_maxsize == 5, (
+                'Проверьте, что размер пула соединений настраивается'
+            )
+        finally:
+            api_session.close()
+
+    def test_configure_recreates_session(self):
+        api_session.configure(http2=False)
+        first = api_session.get_session()
+        api_session.configure(pool_size=3)
+        assert api_session.get_session() is not first, (
+            'Проверьте, что после изменения настроек создается новая сессия'
+        )
+        api_session.close()
+
+    def test_default_timeouts(self, monkeypatch):
+        calls = []
+
+        class Response:
+            content = b''
+
+        class Session:
+
+            def get(self, url, **kwargs):
+                calls.append(kwargs['timeout'])
+                return Response()
+
+            def close(self):
+                pass
+
+        api_session.set_session(Session())
+        try:
+            api_session.get('http://example.test')
+            with api_session.deadline(1):
+                api_session.get('http://example.test')
+        finally:
+            api_session.close()
+        assert calls[0] == (
+            api_session.HTTP_CONNECT_TIMEOUT, api_session.HTTP_READ_TIMEOUT
+        ), 'Проверьте, что запросы выполняются с таймаутами по умолчанию'
+        assert all(0 < value <= 1 for value in calls[1]), (
+            'Проверьте, что таймауты сокращаются до оставшегося срока опроса'
+        )
+
+    def test_hanging_server_bounded_by_deadline(self, monkeypatch):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        port = server.getsockname()[1]
+        monkeypatch.setattr(
+            homework, 'ENDPOINT', f'http://127.0.0.1:{port}/'
+        )
+        api_session.configure(http2=False)
+        started = time.monotonic()
+        try:
+            with api_session.deadline(0.3):
+                with pytest.raises(RequestError):
+                    homework.get_homework_statuses('token', 0)
+                with pytest.raises(DeadlineExceededError):
+                    time.sleep(0.3)
+                    homework.get_homework_statuses('token', 0)
+        finally:
+            api_session.close()
+            server.close()
+        assert time.monotonic() - started < 2, (
+            'Проверьте, что зависший сервер не задерживает опрос дольше '
+            'отведенного срока'
+        )
+
+    def test_slow_body_bounded_by_deadline(self, monkeypatch):
+        stop = threading.Event()
+        server = drip_server(stop)
+        monkeypatch.setattr(
+            homework, 'ENDPOINT',
+            f'http://127.0.0.1:{server.getsockname()[1]}/'
+        )
+        api_session.configure(http2=False)
+        durations = []
+        try:
+            for fetch in (homework.get_homework_statuses,
+                          lambda *args: list(stream_homework_statuses(*args))):
+                started = time.monotonic()
+                with api_session.deadline(0.5):
+                    with pytest.raises(DeadlineExceededError):
+                        fetch('token', 0)
+                durations.append(time.monotonic() - started)
+        finally:
+            stop.set()
+            api_session.close()
+            server.close()
+        assert max(durations) < 1.5, (
+            'Проверьте, что срок опроса ограничивает и медленную передачу '
+            'тела ответа'
+        )
+
+    def test_streaming_with_httpx_client(self, monkeypatch):
+        sent = []
+
+        class Response:
+            status_code = 200
+
+            def __init__(self):
+                self.closed = False
+
+            def iter_bytes(self, chunk_size=None):
+                yield b'{"homeworks": [{"homework_name": "hw1", '
+                yield b'"status": "approved"}], "current_date": 1}'
+
+            def close(self):
+                self.closed = True
+
+        class Client:
+
+            def get(self, url, **kwargs):
+                raise TypeError('stream не поддерживается')
+
+            def build_request(self, method, url, **kwargs):
+                return method, url, kwargs
+
+            def send(self, request, stream=False):
+                sent.append((request, stream))
+                self.response = Response()
+                return self.response
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(homework, 'ENDPOINT', 'http://example.test/')
+        client = Client()
+        api_session.set_session(client)
+        try:
+            stream = stream_homework_statuses('token', 0)
+            homeworks = list(stream)
+        finally:
+            api_session.close()
+        assert [h['homework_name'] for h in homeworks] == ['hw1'], (
+            'Проверьте, что первый опрос разбирается потоково и с клиентом '
+            '`httpx`'
+        )
+        (method, _, kwargs), stream_flag = sent[0]
+        assert method == 'GET' and stream_flag and 'stream' not in kwargs
+        assert kwargs['params'] == {'from_date': 0}
+        assert stream.current_date == 1 and client.response.closed
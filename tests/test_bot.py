@@ -1,10 +1,11 @@
 import os
 from http import HTTPStatus
 
-import requests
 import telegram
 import utils
 
+import api_session
+
 
 class MockResponseGET:
 
@@ -186,7 +187,7 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -232,7 +233,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_500_response_get)
 
         import homework
 
@@ -315,7 +316,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -352,7 +353,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -400,7 +401,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -448,7 +449,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -484,7 +485,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_no_homeworks_response_get)
 
         import homework
 
@@ -525,7 +526,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -565,7 +566,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -599,7 +600,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_empty_response_get)
 
         import homework
 
@@ -626,7 +627,7 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(api_session, 'get', mock_response_get)
 
         import homework
 
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import engine
+import metrics
+from ratelimit import RequestBudget
+from scheduler import AdaptiveInterval
+from tests.test_engine import FakeBot
+
+
+class TestRequestBudget:
+
+    def test_reserve_kept_for_priority(self):
+        now = [0.0]
+        budget = RequestBudget(1, burst=2, reserve=1, clock=lambda: now[0])
+        assert budget.try_acquire() == 0
+        assert budget.try_acquire() == 0
+        assert budget.try_acquire() == 1, (
+            'Проверьте, что обычный запрос не расходует резерв бюджета'
+        )
+        assert budget.try_acquire(priority=True) == 0, (
+            'Проверьте, что приоритетный запрос выполняется за счет резерва'
+        )
+        assert budget.try_acquire(priority=True) == 1
+        now[0] = 2
+        assert budget.try_acquire() == 0
+
+    def test_idle_subscriptions_deferred(self, monkeypatch):
+        polled = []
+        monkeypatch.setattr(
+            engine, 'poll_subscription',
+            lambda subscription, *args: polled.append(subscription.chat_id)
+        )
+        subscriptions = [engine.Subscription(str(i), i) for i in range(3)]
+        subscriptions[2].changed_at = time.time()
+        for subscription in subscriptions:
+            subscription.next_poll_at = time.time() + 0.01
+        budget = RequestBudget(0.01, burst=1, reserve=1)
+        budget.try_acquire()
+        deferred = metrics.BUDGET_DEFERRED.labels().value
+        poller = engine.Poller(
+            FakeBot(), 3, AdaptiveInterval(100, 100, jitter=0), budget=budget
+        )
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(poller.run(subscriptions), 0.3)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run_briefly())
+        assert polled == [2], (
+            'Проверьте, что при нехватке бюджета откладываются только '
+            'подписки без работ на проверке и недавних изменений'
+        )
+        assert metrics.BUDGET_DEFERRED.labels().value == deferred + 2
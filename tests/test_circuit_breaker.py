@@ -0,0 +1,108 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exceptions import (
+    CircuitOpenError, EndpointUnavailableError, RequestError, ResponseError
+)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(error):
+    raise error
+
+
+def make_breaker(clock):
+    return CircuitBreaker(
+        thresholds={EndpointUnavailableError: 2, RequestError: 3},
+        reset_timeout=60, clock=clock
+    )
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = make_breaker(FakeClock())
+        for _ in range(2):
+            with pytest.raises(RequestError):
+                breaker.call(fail, RequestError('сбой'))
+        assert breaker.state == CLOSED
+        with pytest.raises(RequestError):
+            breaker.call(fail, RequestError('сбой'))
+        assert breaker.state == OPEN, (
+            'Проверьте, что предохранитель размыкается после серии ошибок'
+        )
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 'ответ')
+
+    def test_thresholds_per_error_class(self):
+        breaker = make_breaker(FakeClock())
+        for _ in range(2):
+            with pytest.raises(EndpointUnavailableError):
+                breaker.call(fail, EndpointUnavailableError('404'))
+        assert breaker.state == OPEN, (
+            'Проверьте, что порог задается для каждого класса ошибок'
+        )
+
+    def test_untracked_errors_and_success_reset(self):
+        breaker = make_breaker(FakeClock())
+        for _ in range(2):
+            with pytest.raises(RequestError):
+                breaker.call(fail, RequestError('сбой'))
+        assert breaker.call(lambda: 'ответ') == 'ответ'
+        for _ in range(5):
+            with pytest.raises(ResponseError):
+                breaker.call(fail, ResponseError('500'))
+        with pytest.raises(RequestError):
+            breaker.call(fail, RequestError('сбой'))
+        assert breaker.state == CLOSED, (
+            'Проверьте, что успешный запрос сбрасывает счетчики ошибок'
+        )
+
+    def test_half_open_allows_single_probe(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(2):
+            with pytest.raises(EndpointUnavailableError):
+                breaker.call(fail, EndpointUnavailableError('404'))
+        clock.now = 60
+        assert breaker.state == HALF_OPEN
+
+        def probe():
+            with pytest.raises(CircuitOpenError):
+                breaker.call(lambda: 'параллельный запрос')
+            return 'ответ'
+
+        assert breaker.call(probe) == 'ответ', (
+            'Проверьте, что в полуоткрытом состоянии проходит только один '
+            'пробный запрос'
+        )
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(2):
+            with pytest.raises(EndpointUnavailableError):
+                breaker.call(fail, EndpointUnavailableError('404'))
+        clock.now = 60
+        with pytest.raises(RequestError):
+            breaker.call(fail, RequestError('сбой'))
+        assert breaker.state == OPEN
+
+    def test_guard_counts_errors_inside_block(self):
+        breaker = make_breaker(FakeClock())
+        for _ in range(3):
+            with pytest.raises(RequestError):
+                with breaker.guard():
+                    fail(RequestError('сбой чтения ответа'))
+        assert breaker.state == OPEN, (
+            'Проверьте, что ошибки внутри `guard` учитываются предохранителем'
+        )
@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import engine
+from commands import CommandListener, StatusCache, parse_command
+from tests.test_engine import FakeBot, make_response, patch_api
+
+
+def make_update(update_id, chat_id, text):
+    return SimpleNamespace(
+        update_id=update_id,
+        message=SimpleNamespace(chat_id=chat_id, text=text)
+    )
+
+
+def homework(key, status, date_updated):
+    return {
+        'id': key,
+        'homework_name': f'hw{key}',
+        'status': status,
+        'date_updated': date_updated,
+    }
+
+
+class UpdatesBot(FakeBot):
+
+    def __init__(self, updates):
+        super().__init__()
+        self.updates = updates
+        self.offsets = []
+
+    def get_updates(self, offset=None, timeout=None):
+        self.offsets.append(offset)
+        updates, self.updates = self.updates, []
+        return updates
+
+
+class TestStatusCache:
+
+    def test_observe_merges_delta_responses(self):
+        cache = StatusCache(history_size=2)
+        list(cache.observe('key', [
+            homework(1, 'approved', '2022-01-01T00:00:00Z'),
+            homework(2, 'rejected', '2022-01-02T00:00:00Z'),
+            homework(3, 'approved', '2022-01-03T00:00:00Z'),
+        ]))
+        list(cache.observe('key', [
+            homework(2, 'reviewing', '2022-01-04T00:00:00Z'),
+        ]))
+        assert [(r.name, r.status) for r in cache.get('key')] == [
+            ('hw2', 'reviewing'),
+            ('hw3', 'approved'),
+        ], (
+            'Проверьте, что кэш дополняется ответами опросов и хранит '
+            'не более `history_size` последних работ'
+        )
+
+    def test_empty_delta_does_not_create_entry(self):
+        now = [0.0]
+        cache = StatusCache(ttl=10, clock=lambda: now[0])
+        list(cache.observe('key', []))
+        assert cache.get('key') is None, (
+            'Проверьте, что пустой ответ с изменениями не создает запись: '
+            'после перезапуска бот должен отвечать, что данных пока нет'
+        )
+        list(cache.observe('key', [], complete=True))
+        assert cache.get('key') == []
+        list(cache.observe('other', [
+            homework(1, 'approved', '2022-01-01T00:00:00Z'),
+        ], complete=True))
+        now[0] = 8
+        list(cache.observe('other', []))
+        now[0] = 15
+        assert [r.name for r in cache.get('other')] == ['hw1'], (
+            'Проверьте, что пустой ответ с изменениями продлевает запись '
+            'и не стирает известные работы'
+        )
+        now[0] = 30
+        list(cache.observe('other', []))
+        assert cache.get('other') is None
+
+    def test_ttl_and_lru(self):
+        now = [0.0]
+        cache = StatusCache(ttl=10, max_size=2, clock=lambda: now[0])
+        cache.put('a', {}, complete=True)
+        cache.put('b', {}, complete=True)
+        cache.get('a')
+        cache.put('c', {}, complete=True)
+        assert cache.get('b') is None and cache.get('a') == [], (
+            'Проверьте, что при переполнении вытесняется запись, к которой '
+            'дольше всего не обращались'
+        )
+        now[0] = 11
+        assert cache.get('a') is None, (
+            'Проверьте, что устаревшая запись не отдается'
+        )
+
+    def test_interrupted_stream_not_cached(self):
+        def broken():
+            yield homework(1, 'approved', '2022-01-01T00:00:00Z')
+            raise ValueError('обрыв')
+
+        cache = StatusCache()
+        try:
+            list(cache.observe('key', broken()))
+        except ValueError:
+            pass
+        assert cache.get('key') is None
+
+
+class TestCommands:
+
+    def test_parse_command(self):
+        assert parse_command('/Status@homework_bot now') == '/status'
+        assert parse_command('привет') is None
+
+    def test_commands_answered_from_cache(self, monkeypatch,
+                                          random_timestamp):
+        requests = []
+
+        def fake_statuses(token, current_timestamp):
+            requests.append(current_timestamp)
+            return make_response('approved', random_timestamp)
+
+        patch_api(monkeypatch, fake_statuses)
+        subscription = engine.Subscription('token', 42)
+        cache = StatusCache()
+        engine.poll_subscription(subscription, FakeBot(), cache=cache)
+
+        bot = UpdatesBot([
+            make_update(7, 42, '/status'),
+            make_update(8, 42, '/history'),
+            make_update(9, 13, '/status'),
+        ])
+        outbox = FakeBot()
+        listener = CommandListener(bot, outbox, cache, [subscription])
+        listener.poll_once()
+        listener.poll_once()
+
+        assert len(requests) == 1, (
+            'Проверьте, что команды не создают запросов к API Практикума'
+        )
+        assert [chat for chat, _ in outbox.messages] == [42, 42, 13]
+        assert 'hw123' in outbox.messages[0][1], (
+            'Проверьте, что `/status` отвечает статусом из кэша'
+        )
+        assert outbox.messages[2][1].startswith('Этот чат не подписан'), (
+            'Проверьте ответ на команду из чата без подписки'
+        )
+        assert bot.offsets == [None, 10], (
+            'Проверьте, что обработанные обновления подтверждаются '
+            'через `offset`'
+        )
@@ -0,0 +1,51 @@
+from diff import HomeworkIndex
+from records import homework_key
+
+
+def make_homework(homework_id, status):
+    return {
+        'id': homework_id,
+        'homework_name': f'hw{homework_id}',
+        'status': status,
+        'date_updated': '2020-02-13T14:40:57Z'
+    }
+
+
+class TestHomeworkIndex:
+
+    def test_every_changed_homework_reported(self):
+        index = HomeworkIndex({'1': 'reviewing', '2': 'reviewing'})
+        changes = index.diff([
+            make_homework(1, 'approved'),
+            make_homework(2, 'reviewing'),
+            make_homework(3, 'reviewing'),
+        ])
+        assert [change.key for change in changes] == ['1', '3'], (
+            'Проверьте, что сообщается об изменении каждой работы из ответа, '
+            'а не только первой'
+        )
+        assert changes[0].previous_status == 'reviewing'
+        assert changes[1].previous_status is None
+
+    def test_diff_does_not_mutate_until_commit(self):
+        index = HomeworkIndex()
+        change, = index.diff([make_homework(1, 'reviewing')])
+        assert '1' not in index, (
+            'Проверьте, что индекс меняется только после подтверждения'
+        )
+        index.commit(change)
+        assert index.status('1') == 'reviewing'
+        assert index.reviewing
+        assert not index.diff([make_homework(1, 'reviewing')])
+
+    def test_reviewing_counter(self):
+        index = HomeworkIndex({'1': 'reviewing'})
+        change, = index.diff([make_homework(1, 'approved')])
+        index.commit(change)
+        assert not index.reviewing, (
+            'Проверьте, что признак проверки снимается после смены статуса'
+        )
+
+    def test_key_falls_back_to_name(self):
+        assert homework_key({'homework_name': 'hw123'}) == 'hw123'
+        assert homework_key({'id': 5, 'homework_name': 'hw123'}) == '5'
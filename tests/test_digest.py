@@ -0,0 +1,129 @@
+import engine
+from diff import HomeworkIndex
+from digest import ErrorDigest, StatusDigest
+from exceptions import RequestError, ResponseError
+from tests.test_engine import FakeBot, make_response, patch_api
+
+
+class TestErrorDigest:
+
+    def test_alternating_errors_reported_once_per_window(self):
+        now = [1000.0]
+        errors = ErrorDigest(window=60, clock=lambda: now[0])
+        sent = errors.add(RequestError('таймаут'))
+        assert sent == ['Сбой в работе программы: таймаут'], (
+            'Проверьте, что о первой ошибке инцидента сообщается сразу'
+        )
+        for second in range(1, 10):
+            now[0] += 5
+            error_class = ResponseError if second % 2 else RequestError
+            assert errors.add(error_class(f'ошибка {second}')) == [], (
+                'Проверьте, что ошибки внутри окна только подсчитываются'
+            )
+        now[0] += 20
+        digest, = errors.flush()
+        assert 'RequestError: 5 раз(а)' in digest
+        assert 'ResponseError: 5 раз(а)' in digest, (
+            'Проверьте, что сводка группирует ошибки по классам'
+        )
+        assert not errors and errors.flush() == []
+
+    def test_single_error_needs_no_digest(self):
+        now = [0.0]
+        errors = ErrorDigest(window=60, clock=lambda: now[0])
+        errors.add(RequestError('таймаут'))
+        now[0] = 61
+        assert errors.flush() == [], (
+            'Проверьте, что сводка не повторяет единственную ошибку окна'
+        )
+
+    def test_poll_sends_digest_after_window(self, monkeypatch,
+                                            random_timestamp):
+        now = [0.0]
+        responses = [RequestError('таймаут'), ResponseError('код 500'),
+                     RequestError('таймаут'),
+                     make_response('approved', random_timestamp)]
+
+        def fake_statuses(token, current_timestamp):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        patch_api(monkeypatch, fake_statuses)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        subscription.errors = ErrorDigest(window=60, clock=lambda: now[0])
+        for _ in range(3):
+            engine.poll_subscription(subscription, bot)
+            now[0] += 10
+        assert len(bot.messages) == 1
+        now[0] += 60
+        engine.poll_subscription(subscription, bot)
+        texts = [text for _, text in bot.messages]
+        assert texts[1].startswith('Сводка ошибок'), (
+            'Проверьте, что сводка отправляется при первом опросе после '
+            'закрытия окна'
+        )
+        assert len(texts) == 3 and 'hw123' in texts[2]
+
+
+def make_homeworks(current_date, **statuses):
+    return {
+        'homeworks': [
+            {'id': key, 'homework_name': key, 'status': status,
+             'date_updated': '2020-02-13T14:40:57Z'}
+            for key, status in statuses.items()
+        ],
+        'current_date': current_date,
+    }
+
+
+class TestStatusDigest:
+
+    def test_disabled_by_default(self):
+        assert not StatusDigest(window=0).hold()
+
+    def test_changes_coalesced_per_window(self, monkeypatch):
+        now = [0.0]
+        calls = []
+        responses = [
+            make_homeworks(1000, hw1='rejected'),
+            make_homeworks(1030, hw1='approved', hw2='rejected'),
+            make_homeworks(1061, hw1='approved', hw2='rejected'),
+        ]
+
+        def fake_statuses(token, current_timestamp):
+            calls.append(current_timestamp)
+            return responses.pop(0)
+
+        patch_api(monkeypatch, fake_statuses)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        subscription.homeworks = HomeworkIndex(
+            {'hw1': 'reviewing', 'hw2': 'reviewing'}
+        )
+        subscription.current_timestamp = 100
+        subscription.pending = StatusDigest(window=60, clock=lambda: now[0])
+        for _ in range(2):
+            engine.poll_subscription(subscription, bot)
+            now[0] += 30
+        assert bot.messages == [], (
+            'Проверьте, что пока окно открыто, уведомления не отправляются'
+        )
+        assert calls == [100, 100], (
+            'Проверьте, что пока окно открыто, изменения не подтверждаются'
+        )
+        now[0] += 1
+        engine.poll_subscription(subscription, bot)
+        (_, text), = bot.messages
+        assert '"hw1". Работа проверена: ревьюеру' in text
+        assert '"hw2". Работа проверена: у ревьюера' in text
+        assert text.count('hw1') == 1, (
+            'Проверьте, что из окна отправляется только последний статус '
+            'каждой работы'
+        )
+        assert subscription.homeworks.to_dict() == {
+            'hw1': 'approved', 'hw2': 'rejected'
+        }
+        assert not subscription.pending
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import threading
+import time
+
+import engine
+from circuit_breaker import OPEN, CircuitBreaker
+from diff import HomeworkIndex
+from exceptions import DeadlineExceededError, RequestError
+from scheduler import CHANGED, FAILED, UNCHANGED, AdaptiveInterval
+from streaming import HomeworkStream
+
+
+class FakeBot:
+
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+
+def make_response(status, timestamp):
+    return {
+        'homeworks': [{
+            'homework_name': 'hw123',
+            'status': status,
+            'date_updated': '2020-02-13T14:40:57Z'
+        }],
+        'current_date': timestamp
+    }
+
+
+def patch_api(monkeypatch, get_statuses):
+    def stream_statuses(token, current_timestamp):
+        response = get_statuses(token, current_timestamp)
+        return HomeworkStream([json.dumps(response).encode()])
+
+    monkeypatch.setattr(engine, 'get_homework_statuses', get_statuses)
+    monkeypatch.setattr(engine, 'stream_homework_statuses', stream_statuses)
+
+
+class TestEngine:
+
+    def test_load_subscriptions(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'practicum_token': 'a', 'chat_id': 1},
+            {'practicum_token': 'b', 'chat_id': 2},
+        ]))
+        subscriptions = engine.load_subscriptions(path)
+        assert [s.chat_id for s in subscriptions] == [1, 2], (
+            'Проверьте, что подписки загружаются из файла в исходном порядке'
+        )
+
+    def test_poll_subscription_sends_once(self, monkeypatch,
+                                          random_timestamp):
+        calls = []
+
+        def fake_statuses(token, current_timestamp):
+            calls.append((token, current_timestamp))
+            return make_response('approved', random_timestamp)
+
+        patch_api(monkeypatch, fake_statuses)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        first = engine.poll_subscription(subscription, bot)
+        second = engine.poll_subscription(subscription, bot)
+
+        assert (first, second) == (CHANGED, UNCHANGED), (
+            'Проверьте, что опрос сообщает планировщику об изменении статуса'
+        )
+        assert calls[0] == ('token', 0), (
+            'Проверьте, что первый запрос подписки выполняется с ее токеном '
+            'и нулевой временной меткой'
+        )
+        assert len(bot.messages) == 1, (
+            'Проверьте, что неизменившийся статус не отправляется повторно'
+        )
+        assert bot.messages[0][0] == 42, (
+            'Проверьте, что сообщение отправляется в чат подписки'
+        )
+
+    def test_poll_subscription_error_deduplicated(self, monkeypatch):
+        def failing_statuses(token, current_timestamp):
+            raise RequestError('сбой')
+
+        patch_api(monkeypatch, failing_statuses)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        engine.poll_subscription(subscription, bot)
+        engine.poll_subscription(subscription, bot)
+
+        assert len(bot.messages) == 1, (
+            'Проверьте, что одинаковые ошибки не отправляются повторно'
+        )
+
+    def test_invalid_homework_reported(self, monkeypatch):
+        patch_api(
+            monkeypatch,
+            lambda token, current_timestamp: {
+                'homeworks': [1], 'current_date': 100
+            }
+        )
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        subscription.current_timestamp = 50
+        assert engine.poll_subscription(subscription, bot) == FAILED
+        assert len(bot.messages) == 1, (
+            'Проверьте, что пользователь узнает о некорректной работе в '
+            'ответе сервиса'
+        )
+
+    def test_stream_read_error_counts_in_breaker(self, monkeypatch):
+        def chunks():
+            yield b'{"homeworks": ['
+            raise DeadlineExceededError('срок опроса истек')
+
+        monkeypatch.setattr(
+            engine, 'stream_homework_statuses',
+            lambda token, current_timestamp: HomeworkStream(chunks())
+        )
+        breaker = CircuitBreaker(thresholds={RequestError: 1})
+        subscription = engine.Subscription('token', 42)
+        result = engine.poll_subscription(
+            subscription, FakeBot(), breaker=breaker
+        )
+        assert result == FAILED
+        assert breaker.state == OPEN, (
+            'Проверьте, что сбой чтения потокового ответа учитывается '
+            'предохранителем'
+        )
+
+    def test_run_bounds_concurrency(self, monkeypatch):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def slow_poll(subscription, bot, store=None, breaker=None,
+                      cache=None):
+            with lock:
+                active.append(subscription)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(subscription)
+
+        monkeypatch.setattr(engine, 'poll_subscription', slow_poll)
+        subscriptions = [engine.Subscription('t', i) for i in range(10)]
+        interval = AdaptiveInterval(0.001, 0.001)
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(
+                    engine.run(subscriptions, FakeBot(), 3, interval),
+                    timeout=0.2
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run_briefly())
+        assert peak and max(peak) <= 3, (
+            'Проверьте, что число одновременных опросов ограничено'
+        )
+
+    def test_poll_subscription_reports_all_homeworks(self, monkeypatch,
+                                                     random_timestamp):
+        response = make_response('approved', random_timestamp)
+        response['homeworks'].append({
+            'homework_name': 'hw456',
+            'status': 'rejected',
+            'date_updated': '2020-02-14T10:00:00Z'
+        })
+        patch_api(monkeypatch, lambda *args: response)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        subscription.homeworks = HomeworkIndex({'hw123': 'reviewing'})
+        engine.poll_subscription(subscription, bot)
+
+        assert len(bot.messages) == 2, (
+            'Проверьте, что уведомление отправляется по каждой измененной '
+            'работе в ответе'
+        )
+
+    def test_first_poll_reports_latest_homework_only(self, monkeypatch,
+                                                     random_timestamp):
+        response = make_response('approved', random_timestamp)
+        response['homeworks'].append({
+            'homework_name': 'hw456',
+            'status': 'rejected',
+            'date_updated': '2020-02-14T10:00:00Z'
+        })
+        patch_api(monkeypatch, lambda *args: response)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        engine.poll_subscription(subscription, bot)
+
+        assert len(bot.messages) == 1 and 'hw456' in bot.messages[0][1], (
+            'Проверьте, что при первом опросе отправляется только статус '
+            'последней обновленной работы'
+        )
+        assert len(subscription.homeworks) == 2, (
+            'Проверьте, что остальная история записывается в индекс'
+        )
+
+    def test_empty_history_then_all_homeworks_reported(self, monkeypatch,
+                                                       random_timestamp):
+        response = make_response('approved', random_timestamp)
+        response['homeworks'].append({
+            'homework_name': 'hw456',
+            'status': 'reviewing',
+            'date_updated': '2020-02-14T10:00:00Z'
+        })
+        responses = [
+            {'homeworks': [], 'current_date': random_timestamp}, response
+        ]
+        patch_api(monkeypatch, lambda *args: responses.pop(0))
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        engine.poll_subscription(subscription, bot)
+        engine.poll_subscription(subscription, bot)
+
+        assert len(bot.messages) == 2, (
+            'Проверьте, что после пустой истории уведомление отправляется '
+            'по каждой новой работе'
+        )
@@ -0,0 +1,59 @@
+from benchmarks.loadgen import Timelines
+from benchmarks.stubs import VERDICTS
+
+
+def notify(timelines, number, status, received):
+    timelines.record(
+        0,
+        f'Изменился статус проверки работы "st-0-hw-{number}". '
+        f'{VERDICTS[status]}',
+        received
+    )
+
+
+class TestTimelines:
+
+    def make_timelines(self):
+        timelines = Timelines(1, 0, 100, review_time=10, grace=5)
+        timelines._events[0] = [
+            (10, 0, 'reviewing'),
+            (20, 0, 'rejected'),
+            (21, 0, 'reviewing'),
+            (40, 0, 'approved'),
+            (41, 1, 'reviewing'),
+        ]
+        return timelines
+
+    def test_schedule_is_reproducible(self):
+        first = Timelines(3, 0, 3600, review_time=60, seed=7)
+        second = Timelines(3, 0, 3600, review_time=60, seed=7)
+        assert first.events(2) == second.events(2)
+        assert first.events(1) != first.events(2)
+        statuses = {status for _, _, status in first.events(1)}
+        assert statuses <= set(VERDICTS)
+
+    def test_homeworks_since_from_date(self):
+        timelines = self.make_timelines()
+        homeworks = timelines.homeworks(0, 30, 45)
+        assert [(h['homework_name'], h['status']) for h in homeworks] == [
+            ('st-0-hw-0', 'approved'),
+            ('st-0-hw-1', 'reviewing'),
+        ]
+
+    def test_report_counts_missed_and_duplicates(self):
+        timelines = self.make_timelines()
+        notify(timelines, 0, 'reviewing', 12)
+        notify(timelines, 0, 'approved', 43)
+        notify(timelines, 0, 'approved', 50)
+        notify(timelines, 1, 'approved', 60)
+        report = timelines.report(100)
+        assert report['expected'] == 3, (
+            'Проверьте, что короткий `rejected` между двумя `reviewing` '
+            'не требует уведомлений'
+        )
+        assert report['missed'] == 1, (
+            'Проверьте, что статус, продержавшийся дольше `grace`, '
+            'без уведомления считается пропущенным'
+        )
+        assert report['duplicates'] == 1
+        assert report['unexpected'] == 1
@@ -0,0 +1,76 @@
+import io
+import json
+import logging
+import queue
+
+import logs
+import metrics
+
+
+def make_record(level, msg):
+    return logging.LogRecord('engine', level, __file__, 1, msg, None, None)
+
+
+class TestLogs:
+
+    def test_debug_records_sampled(self):
+        sampling = logs.SamplingFilter(every=10)
+        passed = [
+            sampling.filter(make_record(logging.DEBUG, 'Статус не изменился'))
+            for _ in range(30)
+        ]
+        assert passed.count(True) == 3, (
+            'Проверьте, что проходит каждая `every`-я повторяющаяся '
+            'отладочная запись'
+        )
+        assert all(
+            sampling.filter(make_record(logging.ERROR, 'Сбой'))
+            for _ in range(5)
+        ), 'Проверьте, что ошибки не прореживаются'
+
+    def test_sampling_keys_bounded(self):
+        sampling = logs.SamplingFilter(every=10, max_keys=50)
+        passed = [
+            sampling.filter(make_record(logging.DEBUG, ValueError(index)))
+            for index in range(100)
+        ]
+        assert passed.count(True) == 10, (
+            'Проверьте, что записи-объекты одного класса прореживаются вместе'
+        )
+        for index in range(200):
+            sampling.filter(make_record(logging.DEBUG, f'шаблон {index}'))
+        assert len(sampling._counts) <= 50, (
+            'Проверьте, что число счетчиков выборки ограничено'
+        )
+
+    def test_json_records_carry_subscription(self):
+        stream = io.StringIO()
+        root_logger = logging.getLogger()
+        level, handlers = root_logger.level, list(root_logger.handlers)
+        listener = logs.configure(logging.DEBUG, stream, sample_every=1)
+        try:
+            with logs.subscription_context('abc:42'):
+                logging.getLogger('engine').info('Изменился статус работы')
+            logging.getLogger('engine').warning('Вне подписки')
+        finally:
+            listener.stop()
+            root_logger.handlers = handlers
+            root_logger.setLevel(level)
+        records = [json.loads(line) for line in stream.getvalue().split('\n')
+                   if line]
+        assert [record['subscription'] for record in records] == [
+            'abc:42', None
+        ], 'Проверьте, что записи помечаются ключом текущей подписки'
+        assert records[0]['message'] == 'Изменился статус работы'
+        assert records[0]['level'] == 'INFO'
+
+    def test_full_queue_drops_records(self):
+        handler = logs.DroppingQueueHandler(queue.Queue(1))
+        dropped = metrics.LOG_RECORDS_DROPPED.labels().value
+        handler.handle(make_record(logging.INFO, 'первая'))
+        handler.handle(make_record(logging.INFO, 'вторая'))
+        assert handler.queue.qsize() == 1
+        assert metrics.LOG_RECORDS_DROPPED.labels().value == dropped + 1, (
+            'Проверьте, что при переполнении очереди запись отбрасывается '
+            'без ожидания'
+        )
@@ -0,0 +1,55 @@
+from urllib.request import urlopen
+
+from metrics import Counter, Gauge, Histogram, Registry, start_http_server
+
+
+class TestMetrics:
+
+    def test_exposition_format(self):
+        registry = Registry()
+        errors = Counter(
+            'test_errors_total', 'Ошибки.', ['error'], registry=registry
+        )
+        size = Gauge('test_queue_size', 'Очередь.', registry=registry)
+        latency = Histogram(
+            'test_latency_seconds', 'Задержка.', ['stage'],
+            registry=registry, buckets=(0.1, 1)
+        )
+        errors.labels('RequestError').inc()
+        errors.labels('RequestError').inc()
+        size.set_function(lambda: 7)
+        latency.labels('get_api_answer').observe(0.05)
+        latency.labels('get_api_answer').observe(0.5)
+        latency.labels('get_api_answer').observe(5)
+
+        text = registry.exposition()
+        assert '# TYPE test_errors_total counter' in text
+        assert 'test_errors_total{error="RequestError"} 2.0' in text, (
+            'Проверьте формат счетчика с метками'
+        )
+        assert 'test_queue_size 7.0' in text
+        expected = [
+            'test_latency_seconds_bucket{stage="get_api_answer",le="0.1"} 1',
+            'test_latency_seconds_bucket{stage="get_api_answer",le="1.0"} 2',
+            'test_latency_seconds_bucket{stage="get_api_answer",le="+Inf"} 3',
+            'test_latency_seconds_count{stage="get_api_answer"} 3',
+        ]
+        for line in expected:
+            assert line in text, (
+                'Проверьте, что корзины гистограммы накопительные'
+            )
+
+    def test_http_endpoint(self):
+        registry = Registry()
+        Counter('test_polls_total', 'Опросы.', registry=registry).inc()
+        server = start_http_server(0, registry=registry)
+        try:
+            port = server.server_address[1]
+            with urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+                body = response.read().decode()
+            assert 'test_polls_total 1.0' in body, (
+                'Проверьте, что метрики отдаются по адресу /metrics'
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
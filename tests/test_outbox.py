@@ -0,0 +1,243 @@
+import sqlite3
+import threading
+import time
+
+from telegram.error import Unauthorized
+
+import metrics
+from outbox import Outbox
+from ratelimit import TokenBucket
+from storage import MessageJournal
+
+
+class RetryAfter(Exception):
+
+    def __init__(self, retry_after):
+        super().__init__(f'Flood control exceeded. Retry in {retry_after}')
+        self.retry_after = retry_after
+
+
+class RecordingBot:
+
+    def __init__(self, fail_first=None):
+        self.sent = []
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text):
+        with self.lock:
+            if self.fail_first is not None:
+                error, self.fail_first = self.fail_first, None
+                raise error
+            self.sent.append((chat_id, text, time.monotonic()))
+
+
+class TestTokenBucket:
+
+    def test_bucket_limits_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(2, clock=lambda: now[0])
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0.5, (
+            'Проверьте, что пустое ведро сообщает время ожидания токена'
+        )
+        now[0] = 0.5
+        assert bucket.try_acquire() == 0
+
+
+class TestOutbox:
+
+    def test_send_message_does_not_block(self):
+        bot = RecordingBot()
+        outbox = Outbox(bot, chat_interval=0)
+        outbox.send_message(1, 'первое')
+        outbox.send_message(1, 'второе')
+        assert len(outbox) == 2 and not bot.sent, (
+            'Проверьте, что сообщения только ставятся в очередь'
+        )
+        outbox.start()
+        outbox.stop(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['первое', 'второе'], (
+            'Проверьте, что порядок сообщений внутри чата сохраняется'
+        )
+        assert len(outbox) == 0
+
+    def test_chat_interval_respected(self):
+        bot = RecordingBot()
+        outbox = Outbox(bot, chat_interval=0.05)
+        for text in ('a', 'b', 'c'):
+            outbox.send_message(1, text)
+        outbox.send_message(2, 'd')
+        outbox.start()
+        outbox.stop(timeout=5)
+        chat_times = [sent_at for chat, _, sent_at in bot.sent if chat == 1]
+        gaps = [b - a for a, b in zip(chat_times, chat_times[1:])]
+        assert all(gap >= 0.045 for gap in gaps), (
+            'Проверьте, что сообщения в один чат отправляются не чаще '
+            'заданного интервала'
+        )
+        assert bot.sent[1][0] == 2, (
+            'Проверьте, что ожидание одного чата не задерживает другие'
+        )
+
+    def test_retry_after_resends(self):
+        bot = RecordingBot(fail_first=RetryAfter(0.05))
+        outbox = Outbox(bot, chat_interval=0)
+        outbox.send_message(1, 'текст')
+        started = time.monotonic()
+        outbox.start()
+        outbox.stop(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['текст'], (
+            'Проверьте, что после ответа 429 сообщение отправляется повторно'
+        )
+        assert bot.sent[0][2] - started >= 0.045, (
+            'Проверьте, что повтор выполняется после `retry_after`'
+        )
+
+
+class TestMessageJournal:
+
+    def test_failed_message_is_kept_and_replayed(self, tmp_path):
+        journal = MessageJournal(tmp_path / 'state.sqlite3', retry_base=0)
+        bot = RecordingBot(fail_first=ConnectionError('Telegram недоступен'))
+        outbox = Outbox(
+            bot, chat_interval=0, journal=journal, replay_interval=0.01
+        )
+        outbox.send_message(1, 'статус')
+        outbox.start()
+        deadline = time.monotonic() + 5
+        while not bot.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.stop(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['статус'], (
+            'Проверьте, что недоставленное сообщение отправляется повторно '
+            'из журнала'
+        )
+        assert len(journal) == 0, (
+            'Проверьте, что доставленное сообщение удаляется из журнала'
+        )
+        journal.close()
+
+    def test_failed_message_blocks_chat(self, tmp_path):
+        journal = MessageJournal(tmp_path / 'state.sqlite3', retry_base=0.05)
+        bot = RecordingBot(fail_first=ConnectionError('Telegram недоступен'))
+        outbox = Outbox(bot, chat_interval=0, journal=journal)
+        outbox.send_message(1, 'первое')
+        outbox.send_message(1, 'второе')
+        started = time.monotonic()
+        outbox.start()
+        deadline = started + 5
+        while len(bot.sent) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.stop(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['первое', 'второе'], (
+            'Проверьте, что после неудачной отправки следующие сообщения '
+            'чата ждут повтора недоставленного'
+        )
+        assert bot.sent[0][2] - started >= 0.045, (
+            'Проверьте, что повтор выполняется после паузы журнала'
+        )
+        assert len(journal) == 0
+        journal.close()
+
+    def wait_sent(self, bot, count):
+        deadline = time.monotonic() + 5
+        while len(bot.sent) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_permanent_error_drops_message(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        journal = MessageJournal(path, retry_base=10)
+        bot = RecordingBot(fail_first=Unauthorized('bot was blocked'))
+        outbox = Outbox(bot, chat_interval=0, journal=journal)
+        dropped = metrics.MESSAGES_DROPPED.labels('permanent').value
+        outbox.send_message(1, 'первое')
+        outbox.send_message(1, 'второе')
+        outbox.start()
+        self.wait_sent(bot, 1)
+        outbox.stop(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['второе'], (
+            'Проверьте, что сообщение с постоянной ошибкой Telegram не '
+            'повторяется и не задерживает следующие'
+        )
+        assert metrics.MESSAGES_DROPPED.labels('permanent').value == (
+            dropped + 1
+        )
+        assert len(journal) == 0
+        journal.close()
+        with sqlite3.connect(path) as connection:
+            failed = connection.execute(
+                'SELECT text, error FROM failed_messages'
+            ).fetchall()
+        assert failed == [('первое', 'bot was blocked')], (
+            'Проверьте, что отброшенное сообщение сохраняется с ошибкой'
+        )
+
+    def test_attempts_are_limited(self, tmp_path):
+        journal = MessageJournal(
+            tmp_path / 'state.sqlite3', retry_base=0, max_attempts=3
+        )
+        attempts = []
+
+        class FlakyBot(RecordingBot):
+
+            def send_message(self, chat_id, text):
+                if text == 'первое':
+                    attempts.append(text)
+                    raise ConnectionError('Telegram недоступен')
+                super().send_message(chat_id, text)
+
+        bot = FlakyBot()
+        outbox = Outbox(bot, chat_interval=0, journal=journal)
+        outbox.send_message(1, 'первое')
+        outbox.send_message(1, 'второе')
+        outbox.start()
+        self.wait_sent(bot, 1)
+        outbox.stop(timeout=5)
+        assert len(attempts) == 3, (
+            'Проверьте, что число попыток отправки ограничено'
+        )
+        assert [text for _, text, _ in bot.sent] == ['второе']
+        assert len(journal) == 0
+        journal.close()
+
+    def test_pending_messages_survive_restart(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        journal = MessageJournal(path)
+        Outbox(RecordingBot(), journal=journal).send_message(7, 'текст')
+        journal.close()
+
+        journal = MessageJournal(path)
+        bot = RecordingBot()
+        outbox = Outbox(bot, journal=journal)
+        outbox.start()
+        deadline = time.monotonic() + 5
+        while not bot.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outbox.stop(timeout=5)
+        assert [(chat, text) for chat, text, _ in bot.sent] == [
+            (7, 'текст')
+        ], (
+            'Проверьте, что сообщения из журнала отправляются после '
+            'перезапуска'
+        )
+        journal.close()
+
+    def test_backoff_grows(self, tmp_path):
+        journal = MessageJournal(
+            tmp_path / 'state.sqlite3', retry_base=10, retry_ceiling=25
+        )
+        message_id = journal.append(1, 'текст')
+        delays = [
+            journal.record_failure(message_id, 'сбой') for _ in range(3)
+        ]
+        assert delays == [10, 20, 25], (
+            'Проверьте, что пауза между попытками растет экспоненциально и '
+            'ограничена `retry_ceiling`'
+        )
+        assert not journal.claim_due(10), (
+            'Проверьте, что сообщение из очереди отправки не выдается '
+            'повторно из журнала'
+        )
+        journal.close()
@@ -0,0 +1,88 @@
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import metrics
+from profiling import Profiler, profile_action
+
+
+def busy_cycle():
+    with metrics.STAGE_LATENCY.labels('parse_status').time():
+        sum(index * index for index in range(1000))
+
+
+class TestProfiler:
+
+    def test_profiles_requested_cycles(self, tmp_path):
+        profiler = Profiler(tmp_path)
+        with profiler.cycle():
+            busy_cycle()
+        assert not list(tmp_path.iterdir()), (
+            'Проверьте, что без запроса профилирование выключено'
+        )
+        profiler.request(2)
+        for _ in range(3):
+            with profiler.cycle():
+                busy_cycle()
+        assert not profiler.active
+        files = sorted(path.suffix for path in tmp_path.iterdir())
+        assert files == ['.pstats', '.txt'], (
+            'Проверьте, что после заданного числа циклов профиль '
+            'сохраняется в файл'
+        )
+        summary = next(tmp_path.glob('*.txt')).read_text(encoding='utf-8')
+        assert 'parse_status     вызовов      2' in summary, (
+            'Проверьте, что сводка содержит длительность этапов опроса '
+            'только за время профилирования'
+        )
+        assert 'busy_cycle' in summary
+
+    def test_profile_endpoint(self, tmp_path):
+        profiler = Profiler(tmp_path)
+        server = metrics.start_http_server(
+            0, registry=metrics.Registry(), actions={
+                '/profile': lambda params: profile_action(
+                    params, profiler=profiler
+                )
+            }
+        )
+        try:
+            port = server.server_address[1]
+            request = Request(
+                f'http://127.0.0.1:{port}/profile?cycles=5', method='POST'
+            )
+            with urlopen(request) as response:
+                assert response.status == 202
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert profiler.active, (
+            'Проверьте, что профилирование запрашивается через эндпоинт'
+        )
+
+    def test_invalid_cycles_rejected(self, tmp_path):
+        profiler = Profiler(tmp_path)
+        with pytest.raises(ValueError):
+            profiler.request(0)
+        server = metrics.start_http_server(
+            0, registry=metrics.Registry(), actions={
+                '/profile': lambda params: profile_action(
+                    params, profiler=profiler
+                )
+            }
+        )
+        try:
+            port = server.server_address[1]
+            request = Request(
+                f'http://127.0.0.1:{port}/profile?cycles=-1', method='POST'
+            )
+            with pytest.raises(HTTPError) as error:
+                urlopen(request)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert error.value.code == 400, (
+            'Проверьте, что неположительное `cycles` отклоняется ответом 400'
+        )
+        assert not profiler.active
@@ -0,0 +1,60 @@
+import sys
+
+import pytest
+
+from exceptions import InvalidHomeworkError
+from homework import parse_status
+from records import HomeworkRecord
+
+HOMEWORK = {
+    'id': 123,
+    'homework_name': 'hw123',
+    'status': 'approved',
+    'date_updated': '2020-02-13T14:40:57Z',
+    'lesson_name': 'Итоговый проект',
+    'reviewer_comment': 'Всё нравится',
+}
+
+
+class TestHomeworkRecord:
+
+    def test_record_is_compact(self):
+        record = HomeworkRecord.from_api(HOMEWORK)
+        assert not hasattr(record, '__dict__'), (
+            'Проверьте, что запись о работе объявляет `__slots__`'
+        )
+        assert sys.getsizeof(record) < sys.getsizeof(HOMEWORK) / 3
+        assert HomeworkRecord.from_api(record) is record
+
+    def test_fields_parsed_once(self):
+        record = HomeworkRecord.from_api(HOMEWORK)
+        assert (record.key, record.name, record.status) == (
+            '123', 'hw123', 'approved'
+        )
+        assert isinstance(record.updated_at, int)
+        assert record.status is HomeworkRecord(
+            '1', 'hw1', ''.join(['appro', 'ved'])
+        ).status, (
+            'Проверьте, что записи разделяют строки-константы статусов'
+        )
+
+    def test_field_level_comparison(self):
+        record = HomeworkRecord.from_api(HOMEWORK)
+        same = HomeworkRecord.from_api(dict(HOMEWORK, lesson_name='другой'))
+        changed = HomeworkRecord.from_api(dict(HOMEWORK, status='rejected'))
+        assert record == same, (
+            'Проверьте, что записи сравниваются по полям, а не по словарю'
+        )
+        assert record != changed
+
+    def test_parse_status_accepts_record(self):
+        record = HomeworkRecord.from_api(HOMEWORK)
+        assert parse_status(record) == parse_status(HOMEWORK)
+
+    @pytest.mark.parametrize('homework', [
+        1, None, dict(HOMEWORK, date_updated='вчера'),
+        dict(HOMEWORK, date_updated=1581604857),
+    ])
+    def test_invalid_homework_rejected(self, homework):
+        with pytest.raises(InvalidHomeworkError):
+            HomeworkRecord.from_api(homework)
@@ -0,0 +1,90 @@
+import json
+
+import api_session
+import homework
+import replay
+from tests.test_engine import make_response
+
+
+class TestReplay:
+
+    def record_traffic(self, path, responses):
+        session = replay.ReplaySession()
+        recorder = replay.Recorder(path)
+        api_session.set_session(session)
+        api_session.set_recorder(recorder)
+        try:
+            for status, body in responses:
+                session.record = {'status': status, 'body': body}
+                try:
+                    homework.get_homework_statuses('secret', 0)
+                except Exception:
+                    pass
+        finally:
+            api_session.set_recorder(None)
+            api_session.close()
+            recorder.close()
+
+    def test_recorded_file_is_compact_and_hides_token(self, tmp_path):
+        path = tmp_path / 'traffic.jsonl.gz'
+        body = json.dumps(make_response('approved', 1))
+        self.record_traffic(path, [(200, body), (None, 'timeout')])
+        records = list(replay.read_records(path))
+        assert [record['status'] for record in records] == [200, None], (
+            'Проверьте, что записываются и ответы, и сбои запросов'
+        )
+        assert records[0]['body'] == body
+        assert 'secret' not in json.dumps(records), (
+            'Проверьте, что токен не попадает в запись'
+        )
+
+    def test_replay_runs_notification_path(self, tmp_path):
+        path = tmp_path / 'traffic.jsonl'
+        self.record_traffic(path, [
+            (200, json.dumps(make_response('reviewing', 1))),
+            (500, '{}'),
+            (200, json.dumps(make_response('reviewing', 2))),
+            (200, json.dumps(make_response('approved', 3))),
+        ])
+        bot = replay.NullBot()
+        outcomes = replay.replay(replay.read_records(path), bot)
+        assert outcomes == {'changed': 2, 'failed': 1, 'unchanged': 1}, (
+            'Проверьте, что записанные ответы проходят проверку ответа и '
+            'поиск изменений'
+        )
+        assert bot.sent == 3, (
+            'Проверьте, что при воспроизведении отправляются уведомления и '
+            'сообщение об ошибке'
+        )
+
+    def test_invalid_record_does_not_abort_replay(self):
+        records = [
+            {'t': 1.0, 'token': 'a', 'status': 200, 'body': 'не JSON'},
+            {'t': 2.0, 'token': 'a', 'status': 200, 'body': '[1, 2]'},
+            {'t': 2.5, 'token': 'a', 'status': 200,
+             'body': '{"homeworks": [1], "current_date": 200}'},
+            {'t': 3.0, 'token': 'a', 'status': 200,
+             'body': json.dumps(make_response('approved', 3))},
+        ]
+        bot = replay.NullBot()
+        outcomes = replay.replay(records, bot)
+        assert outcomes == {'invalid': 3, 'changed': 1}, (
+            'Проверьте, что некорректный записанный ответ учитывается как '
+            '`invalid` и воспроизведение продолжается'
+        )
+        assert bot.sent == 2, (
+            'Проверьте, что о некорректной работе в ответе сообщается, а '
+            'уведомление из следующего ответа отправляется'
+        )
+
+    def test_replay_at_recorded_speed(self):
+        pauses = []
+        records = [
+            {'t': 10.0, 'token': 'a', 'status': None, 'body': 'timeout'},
+            {'t': 14.0, 'token': 'a', 'status': None, 'body': 'timeout'},
+        ]
+        replay.replay(records, replay.NullBot(), speed=2,
+                      sleep=pauses.append)
+        assert pauses == [2.0], (
+            'Проверьте, что паузы между ответами масштабируются на `speed`'
+        )
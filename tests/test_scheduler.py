@@ -0,0 +1,41 @@
+import pytest
+
+from scheduler import CHANGED, FAILED, UNCHANGED, AdaptiveInterval
+
+
+class TestAdaptiveInterval:
+
+    def test_reviewing_polls_at_floor(self):
+        interval = AdaptiveInterval(60, 1800)
+        assert interval.next_delay(900, UNCHANGED, reviewing=True) == 60, (
+            'Проверьте, что работа на проверке опрашивается с минимальным '
+            'интервалом'
+        )
+        assert interval.next_delay(900, CHANGED) == 60
+
+    def test_idle_backs_off_to_ceiling(self):
+        interval = AdaptiveInterval(60, 1800, jitter=0)
+        delay = interval.initial
+        delays = []
+        for _ in range(10):
+            delay = interval.next_delay(delay, UNCHANGED)
+            delays.append(delay)
+        assert delays[:3] == [120, 240, 480], (
+            'Проверьте, что без изменений интервал растет экспоненциально'
+        )
+        assert delays[-1] == 1800, (
+            'Проверьте, что интервал не превышает верхнюю границу'
+        )
+
+    def test_errors_back_off_even_when_reviewing(self):
+        interval = AdaptiveInterval(60, 1800)
+        for _ in range(100):
+            delay = interval.next_delay(600, FAILED, reviewing=True)
+            assert 60 <= delay <= 1200, (
+                'Проверьте, что при ошибках интервал растет с разбросом в '
+                'заданных границах'
+            )
+
+    def test_invalid_bounds(self):
+        with pytest.raises(ValueError):
+            AdaptiveInterval(100, 10)
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+import engine
+from scheduler import AdaptiveInterval
+from sharding import HashRing, ShardCoordinator
+from storage import StateStore
+from tests.test_engine import FakeBot
+
+
+class TestHashRing:
+
+    def test_keys_spread_and_move_minimally(self):
+        keys = [f'key-{index}' for index in range(3000)]
+        ring = HashRing(['a', 'b', 'c'])
+        owners = {key: ring.owner(key) for key in keys}
+        shares = [list(owners.values()).count(node) for node in 'abc']
+        assert min(shares) > 700, (
+            'Проверьте, что ключи распределяются между узлами равномерно'
+        )
+        grown = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in keys if grown.owner(key) != owners[key]]
+        assert all(grown.owner(key) == 'd' for key in moved), (
+            'Проверьте, что при добавлении узла ключи переезжают только '
+            'на новый узел'
+        )
+        assert len(moved) < len(keys) / 2
+
+    def test_empty_ring(self):
+        assert HashRing().owner('key') is None
+
+
+class TestShardCoordinator:
+
+    def make_pair(self, tmp_path, now):
+        path = tmp_path / 'shard.sqlite3'
+        first = ShardCoordinator(path, 'first', clock=lambda: now[0])
+        second = ShardCoordinator(path, 'second', clock=lambda: now[0])
+        first.heartbeat()
+        second.heartbeat()
+        first.heartbeat()
+        return first, second
+
+    def test_workers_split_subscriptions(self, tmp_path):
+        now = [1000.0]
+        first, second = self.make_pair(tmp_path, now)
+        keys = [f'key-{index}' for index in range(100)]
+        assert first.workers == second.workers == {'first', 'second'}
+        assert all(first.owns(key) != second.owns(key) for key in keys), (
+            'Проверьте, что каждая подписка принадлежит ровно одному процессу'
+        )
+        first.close()
+        second.close()
+
+    def test_lease_prevents_double_polling(self, tmp_path):
+        now = [1000.0]
+        first, second = self.make_pair(tmp_path, now)
+        key = next(
+            f'key-{index}' for index in range(100)
+            if first.owns(f'key-{index}')
+        )
+        assert first.acquire(key)
+        second._ring = HashRing(['second'])
+        assert not second.acquire(key), (
+            'Проверьте, что процесс с устаревшим кольцом не забирает '
+            'подписку, пока действует чужая аренда'
+        )
+        now[0] += first.lease_ttl + 1
+        assert second.acquire(key), (
+            'Проверьте, что истекшую аренду можно забрать'
+        )
+        first.close()
+        second.close()
+
+    def test_rebalance_when_worker_leaves(self, tmp_path):
+        now = [1000.0]
+        first, second = self.make_pair(tmp_path, now)
+        keys = [f'key-{index}' for index in range(100)]
+        owned = [key for key in keys if first.owns(key)]
+        for key in owned:
+            assert first.acquire(key)
+        first.leave()
+        second.heartbeat()
+        assert all(second.owns(key) for key in keys)
+        assert all(second.acquire(key) for key in owned), (
+            'Проверьте, что ушедший процесс освобождает свои аренды'
+        )
+        now[0] += second.heartbeat_ttl + 1
+        first.heartbeat()
+        second.heartbeat()
+        assert second.workers == {'first', 'second'}
+        first.close()
+        second.close()
+
+    def test_foreign_subscription_not_polled(self, tmp_path, monkeypatch):
+        now = [1000.0]
+        first, second = self.make_pair(tmp_path, now)
+        subscription = next(
+            subscription for subscription in (
+                engine.Subscription(f'token-{index}', index)
+                for index in range(100)
+            )
+            if second.owns(subscription.key)
+        )
+
+        def fail(*args):
+            raise AssertionError('Чужая подписка не должна опрашиваться')
+
+        monkeypatch.setattr(engine, 'poll_subscription', fail)
+        assert engine._poll_owned(
+            subscription, FakeBot(), None, None, None, first
+        ) is None
+        first.close()
+        second.close()
+
+    def test_shutdown_keeps_foreign_state(self, tmp_path, monkeypatch):
+        now = [time.time()]
+        first, second = self.make_pair(tmp_path, now)
+        subscriptions = [
+            engine.Subscription(f'token-{index}', index)
+            for index in range(100)
+        ]
+        own = next(s for s in subscriptions if first.owns(s.key))
+        foreign = next(s for s in subscriptions if second.owns(s.key))
+        store = StateStore(tmp_path / 'state.sqlite3')
+        foreign.current_timestamp = 500
+        store.save(foreign)
+        poller = engine.Poller(
+            FakeBot(), 2, AdaptiveInterval(100, 100, jitter=0), store,
+            shard=first
+        )
+
+        loops = []
+
+        async def run_until_polled():
+            loops.append(asyncio.get_running_loop())
+            await poller.run([own, foreign])
+
+        def poll(subscription, *args):
+            owner_copy = engine.Subscription(
+                foreign.practicum_token, foreign.chat_id
+            )
+            owner_copy.current_timestamp = 900
+            store.save(owner_copy)
+            subscription.current_timestamp = 700
+            loops[0].call_soon_threadsafe(poller.stop)
+            return 'unchanged'
+
+        monkeypatch.setattr(engine, 'poll_subscription', poll)
+        for subscription in (own, foreign):
+            subscription.next_poll_at = time.time() + 0.01
+        asyncio.run(run_until_polled())
+
+        restored_own = engine.Subscription(own.practicum_token, own.chat_id)
+        restored_foreign = engine.Subscription(
+            foreign.practicum_token, foreign.chat_id
+        )
+        store.load(restored_own)
+        store.load(restored_foreign)
+        store.close()
+        first.close()
+        second.close()
+        assert restored_own.current_timestamp == 700
+        assert restored_foreign.current_timestamp == 900, (
+            'Проверьте, что при остановке процесс не перезаписывает '
+            'состояние подписок, которые опрашивает другой процесс'
+        )
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import engine
+from benchmarks import stubs
+from scheduler import AdaptiveInterval
+from storage import StateStore
+from tests.test_engine import FakeBot
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestGracefulShutdown:
+
+    def test_stop_finishes_poll_and_snapshots_schedule(self, tmp_path,
+                                                       monkeypatch):
+        started = threading.Event()
+        finished = []
+
+        def slow_poll(subscription, bot, store=None, breaker=None,
+                      cache=None):
+            started.set()
+            time.sleep(0.2)
+            finished.append(subscription.chat_id)
+            return 'unchanged'
+
+        monkeypatch.setattr(engine, 'poll_subscription', slow_poll)
+        store = StateStore(tmp_path / 'state.sqlite3')
+        interval = AdaptiveInterval(100, 100, jitter=0)
+        poller = engine.Poller(FakeBot(), 2, interval, store)
+
+        async def run_and_stop():
+            task = asyncio.ensure_future(
+                poller.run([engine.Subscription('token', 42)])
+            )
+            await asyncio.get_running_loop().run_in_executor(
+                None, started.wait
+            )
+            poller.stop()
+            await task
+
+        asyncio.run(run_and_stop())
+        assert finished == [42], (
+            'Проверьте, что остановка дожидается завершения начатого опроса'
+        )
+
+        polls = []
+        monkeypatch.setattr(
+            engine, 'poll_subscription',
+            lambda subscription, *args: polls.append(subscription)
+        )
+        restored = engine.Poller(FakeBot(), 2, interval, store)
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(
+                    restored.run([engine.Subscription('token', 42)]), 0.2
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run_briefly())
+        store.close()
+        assert not polls, (
+            'Проверьте, что после перезапуска подписка опрашивается по '
+            'сохраненному расписанию, а не сразу'
+        )
+        assert restored.subscriptions[0].poll_delay == 100
+
+    def test_repeated_cancel_waits_for_poll(self, monkeypatch):
+        started = threading.Event()
+        finished = []
+
+        def slow_poll(subscription, *args):
+            started.set()
+            time.sleep(0.2)
+            finished.append(subscription.chat_id)
+            return 'unchanged'
+
+        monkeypatch.setattr(engine, 'poll_subscription', slow_poll)
+        interval = AdaptiveInterval(100, 100, jitter=0)
+        poller = engine.Poller(FakeBot(), 2, interval)
+
+        async def cancel_twice():
+            poller._executor = ThreadPoolExecutor(1)
+            subscription = engine.Subscription('token', 42)
+            subscription.poll_delay = 100
+            task = asyncio.ensure_future(poller._poll(subscription))
+            await asyncio.get_running_loop().run_in_executor(
+                None, started.wait
+            )
+            task.cancel()
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            poller._executor.shutdown()
+            return subscription
+
+        subscription = asyncio.run(cancel_twice())
+        assert finished == [42], (
+            'Проверьте, что повторная отмена не прерывает ожидание начатого '
+            'опроса'
+        )
+        assert subscription.next_poll_at is not None
+
+    def test_update_adds_and_removes_subscriptions(self, monkeypatch):
+        polled = []
+        monkeypatch.setattr(
+            engine, 'poll_subscription',
+            lambda subscription, *args: polled.append(subscription.chat_id)
+        )
+        interval = AdaptiveInterval(100, 100, jitter=0)
+        poller = engine.Poller(FakeBot(), 2, interval)
+
+        async def run_and_update():
+            task = asyncio.ensure_future(
+                poller.run([engine.Subscription('a', 1)])
+            )
+            await asyncio.sleep(0.05)
+            poller.update([engine.Subscription('b', 2)])
+            await asyncio.sleep(0.05)
+            poller.stop()
+            await task
+
+        asyncio.run(run_and_update())
+        assert [s.chat_id for s in poller.subscriptions] == [2]
+        assert polled == [1, 2], (
+            'Проверьте, что новые подписки начинают опрашиваться без '
+            'перезапуска'
+        )
+
+    def test_sigterm_saves_state(self, tmp_path):
+        process, endpoint, telegram_url = stubs.start(stubs.Options())
+        state_db = tmp_path / 'state.sqlite3'
+        env = dict(
+            os.environ,
+            PRACTICUM_TOKEN='token-0',
+            TELEGRAM_TOKEN='123:test',
+            TELEGRAM_CHAT_ID='0',
+            PRACTICUM_ENDPOINT=endpoint,
+            TELEGRAM_API_URL=f'{telegram_url}/bot',
+            STATE_DB=str(state_db),
+        )
+        env.pop('SUBSCRIPTIONS_FILE', None)
+        bot = subprocess.Popen(
+            [sys.executable, 'homework.py'], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = time.time() + 20
+            while (stubs.fetch_stats(telegram_url)['requests'] == 0
+                   and time.time() < deadline):
+                time.sleep(0.05)
+            bot.send_signal(signal.SIGTERM)
+            returncode = bot.wait(timeout=20)
+        finally:
+            bot.kill()
+            process.terminate()
+        assert returncode == 0, (
+            'Проверьте, что по SIGTERM бот завершается штатно'
+        )
+        with sqlite3.connect(state_db) as connection:
+            next_poll_at, = connection.execute(
+                'SELECT next_poll_at FROM subscription_state'
+            ).fetchone()
+        assert next_poll_at and next_poll_at > time.time(), (
+            'Проверьте, что при остановке сохраняется расписание опроса'
+        )
@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('telegram', 'requests', 'asyncio')
+IMPORT_TIME_BUDGET = 0.2
+
+
+def run_python(code, **env):
+    environment = {
+        key: value for key, value in os.environ.items()
+        if key not in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
+                       'TELEGRAM_CHAT_ID', 'SUBSCRIPTIONS_FILE',
+                       'SHARDED', 'WORKER_ID')
+    }
+    environment.update(env)
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, env=environment,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+class TestStartup:
+
+    def test_import_defers_heavy_modules(self):
+        loaded = run_python(
+            'import json, sys, homework\n'
+            f'print(json.dumps([m for m in {HEAVY_MODULES!r} '
+            'if m in sys.modules]))'
+        )
+        assert loaded == [], (
+            f'Убедитесь, что импорт `homework` не загружает {loaded}'
+        )
+
+    def test_missing_tokens_exit_before_heavy_imports(self):
+        loaded = run_python(
+            'import json, sys, homework\n'
+            'try:\n'
+            '    homework.main()\n'
+            'except SystemExit:\n'
+            f'    print(json.dumps([m for m in {HEAVY_MODULES!r} '
+            'if m in sys.modules]))'
+        )
+        assert loaded == [], (
+            'Убедитесь, что при отсутствии переменных окружения бот '
+            f'завершается, не загружая {loaded}'
+        )
+
+    def test_sharded_requires_worker_id(self):
+        result = run_python(
+            'import json, homework\n'
+            'try:\n'
+            '    homework.main()\n'
+            'except SystemExit as error:\n'
+            '    print(json.dumps(str(error)))',
+            PRACTICUM_TOKEN='token', TELEGRAM_TOKEN='123:test',
+            TELEGRAM_CHAT_ID='0', SHARDED='1'
+        )
+        assert 'WORKER_ID' in result, (
+            'Убедитесь, что в режиме SHARDED бот не запускается без '
+            'постоянного `WORKER_ID`'
+        )
+
+    def test_import_time_budget(self):
+        from benchmarks.bench_startup import import_time
+
+        elapsed = min(import_time() for _ in range(3))
+        assert elapsed < IMPORT_TIME_BUDGET, (
+            f'Импорт `homework` занимает {elapsed:.3f} с, бюджет - '
+            f'{IMPORT_TIME_BUDGET} с'
+        )
@@ -0,0 +1,73 @@
+import sqlite3
+
+import engine
+from diff import HomeworkIndex
+from exceptions import RequestError
+from storage import StateStore
+
+
+class TestStateStore:
+
+    def test_state_survives_restart(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        subscription = engine.Subscription('token', 42)
+        subscription.current_timestamp = 1000198000
+        subscription.homeworks = HomeworkIndex({'123': 'reviewing'})
+        assert subscription.errors.add(RequestError('сбой'))
+
+        store = StateStore(path)
+        store.save(subscription)
+        store.close()
+
+        restored = engine.Subscription('token', 42)
+        store = StateStore(path)
+        assert store.load(restored), (
+            'Проверьте, что сохраненное состояние подписки находится по ключу'
+        )
+        store.close()
+        assert restored.current_timestamp == 1000198000
+        assert restored.homeworks.to_dict() == {'123': 'reviewing'}
+        assert restored.reviewing
+        assert restored.errors.to_dict() == subscription.errors.to_dict()
+        assert restored.errors.add(RequestError('сбой')) == [], (
+            'Проверьте, что после перезапуска о первой ошибке '
+            'продолжающегося сбоя не сообщается повторно'
+        )
+
+    def test_previous_message_column_migrated(self, tmp_path):
+        path = tmp_path / 'state.sqlite3'
+        with sqlite3.connect(path) as connection:
+            connection.execute(
+                'CREATE TABLE subscription_state ('
+                'key TEXT PRIMARY KEY, from_date INTEGER NOT NULL, '
+                'homeworks TEXT NOT NULL, previous_message TEXT NOT NULL, '
+                'updated_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'INSERT INTO subscription_state VALUES (?, ?, ?, ?, ?)',
+                (engine.Subscription('token', 42).key, 500, '{}',
+                 'Сбой в работе программы: ошибка', 0)
+            )
+        connection.close()
+        store = StateStore(path)
+        restored = engine.Subscription('token', 42)
+        assert store.load(restored)
+        assert restored.current_timestamp == 500
+        assert not restored.errors
+        store.save(restored)
+        store.close()
+
+    def test_unknown_subscription(self, tmp_path):
+        store = StateStore(tmp_path / 'state.sqlite3')
+        subscription = engine.Subscription('other', 1)
+        assert not store.load(subscription), (
+            'Проверьте, что для новой подписки состояние не восстанавливается'
+        )
+        assert subscription.current_timestamp == 0
+        store.close()
+
+    def test_key_hides_token(self):
+        subscription = engine.Subscription('secret-token', 42)
+        assert 'secret-token' not in subscription.key, (
+            'Проверьте, что токен не сохраняется в базе в открытом виде'
+        )
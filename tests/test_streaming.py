@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from streaming import HomeworkStream
+
+
+def chunked(data, size):
+    raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+class TestHomeworkStream:
+
+    @pytest.mark.parametrize('size', [1, 7, 4096])
+    def test_yields_every_homework(self, size, random_timestamp):
+        homeworks = [
+            {'id': i, 'homework_name': f'работа {i}', 'status': 'approved'}
+            for i in range(50)
+        ]
+        stream = HomeworkStream(chunked({
+            'homeworks': homeworks, 'current_date': random_timestamp
+        }, size))
+        assert list(stream) == homeworks, (
+            'Проверьте, что потоковый разбор возвращает все работы при любом '
+            'разбиении ответа на части'
+        )
+        assert stream.current_date == random_timestamp
+
+    def test_buffer_stays_bounded(self, random_timestamp):
+        homeworks = (
+            {'id': i, 'homework_name': 'x' * 100, 'status': 'approved'}
+            for i in range(2000)
+        )
+        stream = HomeworkStream(chunked({
+            'current_date': random_timestamp, 'homeworks': list(homeworks)
+        }, 512))
+        peak = 0
+        for _ in stream:
+            peak = max(peak, len(stream._buffer))
+        assert peak < 2048, (
+            'Проверьте, что в памяти не накапливается весь ответ'
+        )
+
+    def test_close_called(self, random_timestamp):
+        closed = []
+        stream = HomeworkStream(
+            chunked({'homeworks': [], 'current_date': random_timestamp}, 3),
+            lambda: closed.append(True)
+        )
+        assert list(stream) == []
+        assert closed, 'Проверьте, что соединение освобождается после чтения'
+
+    @pytest.mark.parametrize('data, error', [
+        ([{'homeworks': []}], TypeError),
+        ({'current_date': 1}, KeyError),
+        ({'homeworks': []}, KeyError),
+        ({'homeworks': {'status': 'approved'}, 'current_date': 1}, TypeError),
+    ])
+    def test_validation_matches_check_response(self, data, error):
+        with pytest.raises(error):
+            list(HomeworkStream(chunked(data, 5)))
+
+    def test_truncated_response(self):
+        raw = b'{"current_date": 1, "homeworks": [{"id": 1}, {"id"'
+        with pytest.raises(ValueError):
+            list(HomeworkStream([raw]))
@@ -0,0 +1,86 @@
+import time
+
+import engine
+import homework
+from exceptions import SendMessageError
+from tests.test_engine import FakeBot, make_response, patch_api
+
+
+class FailingBot(FakeBot):
+
+    def send_message(self, chat_id, text):
+        raise SendMessageError('сбой')
+
+
+class TestWatermark:
+
+    def test_advance_watermark(self):
+        assert engine.advance_watermark(0, 1000, overlap=60) == 940, (
+            'Проверьте, что отметка отстает от времени сервера на окно '
+            'перекрытия'
+        )
+        assert engine.advance_watermark(990, 1000, overlap=60) == 990, (
+            'Проверьте, что отметка не уменьшается, если часы сервера '
+            'отстают'
+        )
+        assert engine.advance_watermark(940, None) == 940
+        assert engine.advance_watermark(940, 'вчера') == 940
+
+    def test_polls_request_only_delta(self, monkeypatch):
+        calls = []
+        server_time = [1_600_000_000]
+
+        def fake_statuses(token, current_timestamp):
+            calls.append(current_timestamp)
+            return make_response('approved', server_time[0])
+
+        patch_api(monkeypatch, fake_statuses)
+        bot = FakeBot()
+        subscription = engine.Subscription('token', 42)
+        engine.poll_subscription(subscription, bot)
+        server_time[0] += 600
+        engine.poll_subscription(subscription, bot)
+        engine.poll_subscription(subscription, bot)
+
+        overlap = engine.WATERMARK_OVERLAP
+        assert calls == [
+            0,
+            1_600_000_000 - overlap,
+            1_600_000_600 - overlap,
+        ], (
+            'Проверьте, что `from_date` каждого следующего запроса строится '
+            'по `current_date` предыдущего ответа, даже если статус '
+            'не изменился'
+        )
+        assert len(bot.messages) == 1, (
+            'Проверьте, что работа из окна перекрытия не отправляется повторно'
+        )
+
+    def test_watermark_kept_until_delivered(self, monkeypatch,
+                                            random_timestamp):
+        patch_api(
+            monkeypatch,
+            lambda token, current_timestamp: make_response(
+                'approved', random_timestamp
+            )
+        )
+        subscription = engine.Subscription('token', 42)
+        engine.poll_subscription(subscription, FailingBot())
+        assert subscription.current_timestamp == 0, (
+            'Проверьте, что отметка не сдвигается, пока уведомление '
+            'не отправлено'
+        )
+
+    def test_get_timestamp_is_utc(self, monkeypatch):
+        monkeypatch.setenv('TZ', 'Asia/Vladivostok')
+        time.tzset()
+        try:
+            timestamp = homework.get_timestamp(
+                {'date_updated': '2020-02-13T14:40:57Z'}
+            )
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+        assert timestamp == 1581604857, (
+            'Проверьте, что `date_updated` разбирается как время UTC'
+        )